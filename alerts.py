@@ -0,0 +1,275 @@
+# alerts.py (시장 목록/분석 결과를 사용자 규칙으로 검사해 알림을 남기는 엔진)
+#
+# 규칙 파일(alert_rules.json) 예시:
+#   {
+#     "webhookUrl": null,
+#     "rules": [
+#       {"id": "black-ice-cheap", "itemId": "<itemId>", "when": ["lowestSellPrice < 300"]},
+#       {"id": "deal", "when": ["undervalueRatio > 20", "buyOrders > 50"]}
+#     ]
+#   }
+#   -> 조건을 모두 만족하면 reports/alerts.ndjson에 한 줄씩 덧붙이고, webhookUrl이 있으면 그 주소로도 보냅니다.
+#
+# 사용할 수 있는 필드
+#   목록 페이지: lowestSellPrice, highestBuyPrice, sellOrders, buyOrders, spread
+#   분석 결과: 위 필드 + undervalueRatio, avgPrice7d, avgPrice14d, emaShort, emaLong, volatility, zScore, liquidity
+
+import json
+import os
+import re
+import time
+from bisect import bisect_left, bisect_right
+
+from ndjson_store import append_records
+
+try:
+    from curl_cffi import requests
+except ImportError:
+    print("오류: curl_cffi 라이브러리를 찾을 수 없습니다. 'pip install curl_cffi'를 실행해주세요.")
+    exit()
+
+# --- 상수 정의 ---
+RULES_FILE = 'alert_rules.json'
+ALERTS_FILE = os.path.join('reports', 'alerts.ndjson')
+STATE_FILE = 'alert_state.json'
+ALERT_COOLDOWN = 6 * 60 * 60 # 같은 규칙/아이템의 알림을 다시 보내기까지의 최소 간격 (초)
+WEBHOOK_TIMEOUT = 10
+CONDITION = re.compile(r'^\s*([A-Za-z]\w*)\s*(<=|>=|==|!=|<|>)\s*(-?\d+(?:\.\d+)?)\s*$')
+OPERATORS = {
+    "<": lambda a, b: a < b,
+    "<=": lambda a, b: a <= b,
+    ">": lambda a, b: a > b,
+    ">=": lambda a, b: a >= b,
+    "==": lambda a, b: a == b,
+    "!=": lambda a, b: a != b
+}
+# 분석 결과(score_candidates)의 키 -> 규칙에서 쓰는 필드 이름
+REPORT_FIELDS = {
+    "currentLowestSellPrice": "lowestSellPrice",
+    "currentHighestBuyPrice": "highestBuyPrice",
+    "undervalueRatio_7d(%)": "undervalueRatio",
+    "avgPrice_7d": "avgPrice7d",
+    "avgPrice_14d": "avgPrice14d",
+    "ema_short": "emaShort",
+    "ema_long": "emaLong",
+    "volatility(%)": "volatility",
+    "zScore": "zScore",
+    "liquidity": "liquidity"
+}
+
+
+# --- 도우미 함수 ---
+def listing_record(item):
+    """목록/상세 응답 형식의 아이템을 규칙 검사용 {필드: 값}으로 바꿉니다."""
+    market_data = item.get("marketData") or {}
+    sell = (market_data.get("sellStats") or [{}])[0] or {}
+    buy = (market_data.get("buyStats") or [{}])[0] or {}
+    record = {
+        "lowestSellPrice": sell.get("lowestPrice"),
+        "highestBuyPrice": buy.get("highestPrice"),
+        "sellOrders": sell.get("activeCount"),
+        "buyOrders": buy.get("activeCount")
+    }
+    if record["lowestSellPrice"] is not None and record["highestBuyPrice"] is not None:
+        record["spread"] = record["lowestSellPrice"] - record["highestBuyPrice"]
+    return record
+
+def compile_rule(rule):
+    """규칙 하나를 (id, itemId, [(필드, 연산자, 값), ...])로 바꿉니다. 형식이 잘못되면 ValueError를 발생시킵니다."""
+    conditions = []
+    for text in rule.get("when") or []:
+        match = CONDITION.match(text)
+        if not match:
+            raise ValueError(f"조건 형식이 잘못되었습니다: '{text}' (예: 'lowestSellPrice < 300')")
+        field, op, value = match.groups()
+        conditions.append((field, op, float(value)))
+    if not conditions:
+        raise ValueError("조건(when)이 없습니다.")
+    return (str(rule.get("id") or ""), rule.get("itemId"), conditions)
+
+def _matches(rule, record):
+    for field, op, value in rule[2]:
+        actual = record.get(field)
+        if actual is None or not OPERATORS[op](actual, value):
+            return False
+    return True
+
+
+class FileAlertSink:
+    """알림을 NDJSON 파일 끝에 한 줄씩 덧붙입니다."""
+
+    def __init__(self, file_path=ALERTS_FILE):
+        self.file_path = file_path
+
+    def send(self, alerts):
+        os.makedirs(os.path.dirname(self.file_path) or '.', exist_ok=True)
+        append_records(self.file_path, alerts)
+
+
+class WebhookAlertSink:
+    """알림 목록을 JSON으로 webhook 주소에 보냅니다. 실패해도 분석은 계속합니다."""
+
+    def __init__(self, url, timeout=WEBHOOK_TIMEOUT):
+        self.url = url
+        self.timeout = timeout
+
+    def send(self, alerts):
+        try:
+            response = requests.post(self.url, json={"alerts": alerts}, timeout=self.timeout)
+            response.raise_for_status()
+        except Exception as e:
+            print(f"  - 경고: 알림 webhook 전송 실패 ({self.url}): {e}")
+
+
+class AlertEngine:
+    """규칙을 미리 컴파일해 아이템별/필드별 색인에 넣어 두고, 레코드마다 해당될 수 있는 규칙만 검사합니다.
+
+    itemId가 있는 규칙은 아이템 색인에서 바로 찾습니다. itemId가 없는 규칙은 첫 조건의 (필드, 연산자)별로
+    기준값을 정렬해 두므로, 레코드의 값으로 이진 탐색한 범위의 규칙만 나머지 조건을 확인합니다.
+    같은 규칙/아이템의 알림은 ALERT_COOLDOWN 동안 다시 보내지 않습니다.
+    """
+
+    def __init__(self, rules, sinks, cooldown=ALERT_COOLDOWN, state_file=STATE_FILE):
+        self.sinks = sinks
+        self.cooldown = cooldown
+        self.state_file = state_file
+        self.rule_count = len(rules)
+        self.check_seconds = 0.0
+        self.checked_records = 0
+        self.sent_count = 0
+        self._listing = {} # itemId -> 마지막 목록 레코드 (분석 결과 검사 때 주문 수 등을 함께 쓰기 위해)
+        self._last_sent = {}
+        if os.path.exists(state_file):
+            try:
+                with open(state_file, 'r', encoding='utf-8') as f:
+                    self._last_sent = json.load(f)
+            except (OSError, json.JSONDecodeError):
+                print(f"경고: '{state_file}' 파일을 읽지 못해 알림 기록 없이 시작합니다.")
+
+        self._by_item = {}
+        self._equals = {}
+        self._ranges = {}
+        self._scan = []
+        ranges = {}
+        for rule in rules:
+            field, op, value = rule[2][0]
+            if rule[1]:
+                self._by_item.setdefault(rule[1], []).append(rule)
+            elif op == "==":
+                self._equals.setdefault(field, {}).setdefault(value, []).append(rule)
+            elif op == "!=":
+                self._scan.append(rule)
+            else:
+                ranges.setdefault((field, op), []).append((value, rule))
+        for key, entries in ranges.items():
+            entries.sort(key=lambda entry: entry[0])
+            self._ranges[key] = ([value for value, _ in entries], [rule for _, rule in entries])
+
+    @classmethod
+    def load(cls, rules_file=RULES_FILE):
+        """규칙 파일이 있으면 엔진을 만들고, 없거나 규칙이 하나도 없으면 None을 돌려줍니다."""
+        if not os.path.exists(rules_file):
+            return None
+        try:
+            with open(rules_file, 'r', encoding='utf-8') as f:
+                config = json.load(f)
+        except json.JSONDecodeError:
+            print(f"오류: '{rules_file}' 파일의 JSON 형식이 잘못되어 알림을 사용하지 않습니다.")
+            return None
+
+        rules = []
+        for index, rule in enumerate(config.get("rules") or [], 1):
+            try:
+                rules.append(compile_rule(rule))
+            except ValueError as e:
+                print(f"  - 경고: 알림 규칙 {index}번째({rule.get('id', '이름 없음')})를 건너뜁니다. ({e})")
+        if not rules:
+            return None
+        sinks = [FileAlertSink()]
+        if config.get("webhookUrl"):
+            sinks.append(WebhookAlertSink(config["webhookUrl"]))
+        print(f"알림 규칙 {len(rules)}개를 불러왔습니다.")
+        return cls(rules, sinks)
+
+    def _candidates(self, item_id, record):
+        yield from self._by_item.get(item_id, ())
+        yield from self._scan
+        for field, rules_by_value in self._equals.items():
+            yield from rules_by_value.get(record.get(field), ())
+        for (field, op), (values, rules) in self._ranges.items():
+            actual = record.get(field)
+            if actual is None:
+                continue
+            # 첫 조건을 만족하는 기준값의 범위만 고릅니다.
+            if op == "<":
+                yield from rules[bisect_right(values, actual):]
+            elif op == "<=":
+                yield from rules[bisect_left(values, actual):]
+            elif op == ">":
+                yield from rules[:bisect_left(values, actual)]
+            else:
+                yield from rules[:bisect_right(values, actual)]
+
+    def check(self, records, source):
+        """(itemId, 이름, 레코드) 목록을 검사해 조건을 만족한 알림을 보내고, 보낸 알림 목록을 돌려줍니다."""
+        started = time.perf_counter()
+        now = time.time()
+        alerts = []
+        for item_id, name, record in records:
+            for rule in self._candidates(item_id, record):
+                if not _matches(rule, record):
+                    continue
+                key = f"{rule[0]}|{item_id}"
+                if now - self._last_sent.get(key, 0) < self.cooldown:
+                    continue
+                self._last_sent[key] = now
+                alerts.append({
+                    "ruleId": rule[0],
+                    "itemId": item_id,
+                    "name": name,
+                    "source": source,
+                    "values": {field: record.get(field) for field, _, _ in rule[2]},
+                    "at": time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(now))
+                })
+        self.check_seconds += time.perf_counter() - started
+        self.checked_records += len(records)
+
+        if alerts:
+            for alert in alerts:
+                print(f"  - [알림] {alert['ruleId']}: '{alert['name'] or alert['itemId']}' {alert['values']}")
+            for sink in self.sinks:
+                sink.send(alerts)
+            self.sent_count += len(alerts)
+        return alerts
+
+    def check_listing(self, items):
+        """목록 페이지(또는 상세 응답)의 아이템들을 검사합니다. iter_market_candidates의 on_page로 넘깁니다."""
+        records = []
+        for item in items:
+            item_id = (item.get("item") or {}).get("itemId")
+            if not item_id:
+                continue
+            record = listing_record(item)
+            self._listing[item_id] = record
+            records.append((item_id, (item.get("item") or {}).get("name"), record))
+        return self.check(records, "listing")
+
+    def check_results(self, results):
+        """분석 결과(score_candidates)를 검사합니다. 같은 아이템의 마지막 목록 레코드(주문 수 등)를 함께 씁니다."""
+        records = []
+        for result in results:
+            record = dict(self._listing.get(result["itemId"], {}))
+            record.update({field: result.get(key) for key, field in REPORT_FIELDS.items() if result.get(key) is not None})
+            records.append((result["itemId"], result.get("name"), record))
+        return self.check(records, "analysis")
+
+    def close(self):
+        """알림 기록을 저장하고 검사 통계를 출력합니다."""
+        # 재알림 간격이 지난 기록은 지워 파일이 계속 커지지 않게 합니다.
+        now = time.time()
+        self._last_sent = {key: at for key, at in self._last_sent.items() if now - at < self.cooldown}
+        with open(self.state_file, 'w', encoding='utf-8') as f:
+            json.dump(self._last_sent, f)
+        if self.checked_records:
+            print(f"\n[알림] 규칙 {self.rule_count}개로 레코드 {self.checked_records}개 검사, "
+                  f"알림 {self.sent_count}건 (검사 시간 {self.check_seconds * 1000:.1f}ms)")
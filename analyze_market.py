@@ -1,21 +1,25 @@
+import argparse
 import json
 import os
-import re # 지능형 대기를 위해 re 모듈 추가
-import time
-from datetime import datetime, timedelta, timezone
+import queue
+import threading
+from concurrent.futures import ProcessPoolExecutor
 
-try:
-    from curl_cffi import requests
-except ImportError:
-    print("오류: curl_cffi 라이브러리를 찾을 수 없습니다. 'pip install curl_cffi'를 실행해주세요.")
-    exit()
+from alerts import AlertEngine
+from checkpoint import StageCheckpoint
+from graphql_client import GraphQLClient, build_headers, build_operation, operation_path
+from market_cache import MarketCache
+from metrics import METRICS
+from indicators import IndicatorEngine, summarize
+from price_stats import compute_window_stats, undervalue_and_spread, with_fallback
+from price_store import PriceHistoryStore, market_snapshot, refresh_price_histories
 
 # --- 상수 및 설정 ---
 CONFIG_FILE = 'config.json'
 GRAPHQL_DIR = 'graphql'
 REPORTS_DIR = 'reports'
 OUTPUT_FILE = os.path.join(REPORTS_DIR, 'market_analysis_report.json')
-API_URL = "https://public-ubiservices.ubi.com/v1/profiles/me/uplay/graphql"
+FULL_CATALOG_OUTPUT_FILE = os.path.join(REPORTS_DIR, 'market_full_catalog_report.json')
 APP_ID = "3587dc57-db54-4429-b69a-18b546397706"
 
 # --- 사용자 투자 전략 설정 ---
@@ -25,9 +29,13 @@ MAX_PRICE = 4999
 MIN_ORDERS = 20
 SPREAD_PROFIT_RATIO = 0.10
 TRANSACTION_FEE = 0.10
-API_CALL_DELAY = 1.0
-MAX_RETRIES = 5 # 최대 재시도 횟수
-RETRY_DELAY = 10   # 재시도 전 대기 시간 (초)
+API_CALL_DELAY = 1.0 # 요청 사이 최소 간격 (초)
+INITIAL_BATCH_SIZE = 10 # 한 번에 요청할 가격 이력 개수의 초기값 (응답 속도에 따라 자동 조절)
+PIPELINE_MODE = True # True이면 후보 목록 수집과 심층 분석을 동시에 진행합니다
+PIPELINE_QUEUE_SIZE = 100 # 심층 분석을 기다리는 후보의 최대 개수
+DELTA_REFRESH = True # True이면 목록 시세가 마지막으로 이력을 받았을 때와 같은 후보는 가격 이력을 다시 받지 않습니다
+SCORING_WORKERS = os.cpu_count() or 1 # 전체 목록 모드에서 점수 계산에 쓸 프로세스 수
+SCORING_CHUNK_SIZE = 250 # 프로세스 하나에 한 번에 넘길 아이템 수 (이보다 적으면 현재 프로세스에서 계산)
 
 # --- 도우미 함수 ---
 def load_json_file(file_path):
@@ -47,186 +55,357 @@ def save_json_file(data, file_path):
         json.dump(data, f, ensure_ascii=False, indent=2)
     print(f"\n성공: 최종 분석 보고서가 '{file_path}'에 저장되었습니다.")
 
-def make_api_call(session, headers, payload):
-    if not isinstance(payload, list):
-        payload = [payload]
-    response = session.post(API_URL, headers=headers, json=payload, timeout=60, impersonate="chrome110")
-    if response.status_code == 401:
-        raise Exception("인증 실패(401)")
-    response.raise_for_status()
-    return response.json()
-
 # --- 1단계: 데이터 수집 ---
-def fetch_market_candidates(session, headers, query):
-    candidates = []
+def iter_market_candidates(client, query, checkpoint=None, target=TARGET_ITEM_COUNT, on_page=None):
+    """시장 목록을 페이지 단위로 받아, 페이지마다 1차 필터를 통과한 후보 목록을 돌려줍니다.
+
+    checkpoint를 넘기면 페이지마다 결과를 기록하고, 이전에 기록된 페이지는 다시 요청하지 않습니다.
+    target이 None이면 후보 수와 관계없이 totalCount까지 전체 목록을 훑습니다.
+    on_page를 넘기면 새로 받은 페이지의 아이템 전체(필터 전)로 호출합니다 (알림 검사 등).
+    """
+    candidate_count = 0
     processed_ids = set()
     offset = 0
     limit = 50
+    total_count = None
+    listing_done = saved_complete = False
     print("\n[1단계] 시장 유망 아이템 후보 수집 시작...")
-    while len(candidates) < TARGET_ITEM_COUNT:
-        query["variables"]["offset"] = offset
-        try:
-            res = make_api_call(session, headers, query)[0]
-            items = res.get("data", {}).get("game", {}).get("marketableItems", {}).get("nodes", [])
-            if not items: break
-
-            for item in items:
-                item_id = item.get("item", {}).get("itemId")
-                market_data = item.get("marketData")
-                if not item_id or item_id in processed_ids or not market_data: continue
-                
-                sell_stats, buy_stats = market_data.get("sellStats"), market_data.get("buyStats")
-                if not sell_stats or not buy_stats: continue
-                
-                price = sell_stats[0].get("lowestPrice")
-                sell_orders, buy_orders = sell_stats[0].get("activeCount"), buy_stats[0].get("activeCount")
-
-                if all(v is not None for v in [price, sell_orders, buy_orders]):
-                    if (MIN_PRICE <= price <= MAX_PRICE) and (sell_orders >= MIN_ORDERS) and (buy_orders >= MIN_ORDERS):
-                        candidates.append(item)
-                        processed_ids.add(item_id)
-                if len(candidates) >= TARGET_ITEM_COUNT: break
-            
-            if len(items) < limit: break
-            offset += len(items)
-            time.sleep(API_CALL_DELAY)
-        except Exception as e:
-            print(f"  - 시장 후보 수집 중 오류: {e}")
+    if checkpoint is not None:
+        saved_records = checkpoint.records()
+        for record in saved_records:
+            if record.get("complete"):
+                listing_done = saved_complete = True
+                continue
+            page_candidates = record["candidates"]
+            processed_ids.update(item["item"]["itemId"] for item in page_candidates)
+            candidate_count += len(page_candidates)
+            offset = record["nextOffset"]
+            if page_candidates:
+                yield page_candidates
+        if saved_records:
+            print(f"  - 중간 결과에서 후보 {candidate_count}개를 불러왔습니다. ({offset}번째부터 이어서 수집)")
+
+    while not listing_done and (target is None or candidate_count < target):
+        # 목록 페이지도 일괄 요청 경로로 보내 일시적인 오류(503, RATE_LIMIT)는 재시도합니다.
+        # 인증 만료(AuthError) 같은 치명적인 오류는 그대로 올려보내 중간 결과를 지우지 않게 합니다.
+        res = client.execute_batched([build_operation(query, offset=offset)])[0]
+        if res is None:
+            print(f"  - 시장 목록 {offset}번째부터의 페이지를 최대 재시도 후에도 받지 못해 목록 수집을 멈춥니다.")
+            break
+        marketable_items = res.get("data", {}).get("game", {}).get("marketableItems", {})
+        items = marketable_items.get("nodes", [])
+        total_count = marketable_items.get("totalCount", total_count)
+        if not items:
+            listing_done = True
             break
-    print(f"1차 필터링 후, 분석 대상 유망 후보 {len(candidates)}개 선정.")
-    return candidates
+        if on_page is not None:
+            on_page(items)
+
+        page_candidates = []
+        for item in items:
+            item_id = item.get("item", {}).get("itemId")
+            market_data = item.get("marketData")
+            if not item_id or item_id in processed_ids or not market_data: continue
+            
+            sell_stats, buy_stats = market_data.get("sellStats"), market_data.get("buyStats")
+            if not sell_stats or not buy_stats: continue
+            
+            price = sell_stats[0].get("lowestPrice")
+            sell_orders, buy_orders = sell_stats[0].get("activeCount"), buy_stats[0].get("activeCount")
+
+            if all(v is not None for v in [price, sell_orders, buy_orders]):
+                if (MIN_PRICE <= price <= MAX_PRICE) and (sell_orders >= MIN_ORDERS) and (buy_orders >= MIN_ORDERS):
+                    page_candidates.append(item)
+                    processed_ids.add(item_id)
+            if target is not None and candidate_count + len(page_candidates) >= target: break
+        
+        candidate_count += len(page_candidates)
+        offset += len(items)
+        listing_done = len(items) < limit or (total_count is not None and offset >= total_count)
+        if target is None and total_count:
+            print(f"  - 목록 {min(offset, total_count)}/{total_count}개 확인, 후보 {candidate_count}개")
+        if checkpoint is not None:
+            checkpoint.append({"nextOffset": offset, "candidates": page_candidates})
+        if page_candidates:
+            yield page_candidates
+    if checkpoint is not None and not saved_complete and (listing_done or (target is not None and candidate_count >= target)):
+        checkpoint.mark_complete()
+    print(f"1차 필터링 후, 분석 대상 유망 후보 {candidate_count}개 선정.")
+
+def fetch_market_candidates(client, query, checkpoint=None, target=TARGET_ITEM_COUNT, on_page=None):
+    with METRICS.span("stage1_market_candidates"):
+        return [item for page_candidates in iter_market_candidates(client, query, checkpoint, target, on_page) for item in page_candidates]
 
 # --- 2단계: 심층 분석 (수정된 함수) ---
-def analyze_deep_dive(session, headers, all_items_map):
+def analyze_deep_dive(client, store, all_items_map, workers=1, delta_refresh=DELTA_REFRESH):
     print("\n[2단계] 심층 분석 시작...")
-    history_q = load_json_file(os.path.join(GRAPHQL_DIR, 'GetItemPriceHistory.json'))
-    if not history_q: return []
+    history_q = load_json_file(operation_path(GRAPHQL_DIR, 'GetItemPriceHistory.json'))
+    metadata_q = load_json_file(os.path.join(GRAPHQL_DIR, 'GetItemMetadata.json'))
+    if not history_q or not metadata_q: return []
     
-    analysis_results = []
-    batch_size = 10
-    item_list = list(all_items_map.values())
-    item_batches = [item_list[i:i + batch_size] for i in range(0, len(item_list), batch_size)]
+    item_list = [item for item in all_items_map.values() if item.get('item')]
+    # 실패한 아이템만 골라 재시도하며, 오늘 이미 받은 아이템은 로컬 저장소의 이력을 사용합니다.
+    with METRICS.span("stage2_deep_dive"):
+        available_ids = refresh_price_histories(client, store, history_q, [item['item']['itemId'] for item in item_list],
+                                                listing_snapshots(item_list) if delta_refresh else None)
 
-    for batch in item_batches:
-        payloads = [dict(history_q, variables=dict(history_q["variables"], itemId=item['item']['itemId'])) for item in batch if item.get('item')]
-        if not payloads: continue
+    failed_count = len(item_list) - len(available_ids)
+    if failed_count:
+        print(f"    - 최대 재시도 후에도 {failed_count}개 아이템 처리 실패. 실패한 아이템은 건너뜁니다.")
 
-        print(f"  - {len(batch)}개 아이템 가격 히스토리 일괄 요청...")
-        
-        successful_responses = {} # key: itemId, value: response
-        payloads_to_retry = {p['variables']['itemId']: p for p in payloads}
-        
-        for attempt in range(MAX_RETRIES):
-            if not payloads_to_retry:
-                break
+    attach_item_metadata(client, metadata_q, [item for item in item_list if item['item']['itemId'] in available_ids])
+    return score_candidates(store, item_list, available_ids, workers)
 
-            print(f"    - 시도 {attempt + 1}/{MAX_RETRIES}: {len(payloads_to_retry)}개 아이템 요청...")
-            
-            current_payload_list = list(payloads_to_retry.values())
-            error_str = "" # 오류 메시지 저장을 위해 초기화
-            
-            try:
-                responses = make_api_call(session, headers, current_payload_list)
-                
-                if not isinstance(responses, list) or len(responses) != len(current_payload_list):
-                    raise ValueError(f"API 응답 개수({len(responses)})가 요청 개수({len(current_payload_list)})와 다릅니다.")
-
-                next_retry_payloads = {}
-                for i, res in enumerate(responses):
-                    item_id_in_req = current_payload_list[i]['variables']['itemId']
-                    
-                    if res and not res.get("errors"):
-                        successful_responses[item_id_in_req] = res
-                    else:
-                        next_retry_payloads[item_id_in_req] = payloads_to_retry[item_id_in_req]
-
-                payloads_to_retry = next_retry_payloads
-                
-            except Exception as e:
-                error_str = str(e)
-                print(f"    - API 호출 중 예외 발생: {error_str}")
-
-            if payloads_to_retry and attempt < MAX_RETRIES - 1:
-                delay = RETRY_DELAY
-                if "RATE_LIMIT" in error_str:
-                    match = re.search(r'try again in (\d+)', error_str)
-                    if match:
-                        delay = int(match.group(1)) + 1
-                        print(f"    - 서버가 요청한 대기 시간({delay-1}초)을 준수합니다.")
-                print(f"    - {delay}초 후 실패한 {len(payloads_to_retry)}개 항목에 대해 재시도합니다...")
-                time.sleep(delay)
-        
-        if payloads_to_retry:
-            print(f"    - 최대 재시도 후에도 {len(payloads_to_retry)}개 아이템 처리 실패. 이 묶음에서 실패한 아이템은 건너뜁니다.")
-
-        time.sleep(API_CALL_DELAY * 1.5)
-
-        for item in batch:
-            try:
-                item_id = item.get("item", {}).get("itemId")
-                if not item_id or item_id not in successful_responses:
-                    continue
-
-                res = successful_responses[item_id]
-                
-                marketable_item = res.get("data", {}).get("game", {}).get("marketableItem")
-                if not marketable_item: continue
-                
-                price_history = marketable_item.get("priceHistory", [])
-                market_data = item.get("marketData")
-                if not market_data: continue
-                
-                sell_stats, buy_stats = market_data.get("sellStats"), market_data.get("buyStats")
-                if not sell_stats or not buy_stats: continue
-
-                current_sell = sell_stats[0].get("lowestPrice")
-                current_buy = buy_stats[0].get("highestPrice")
-                if not current_sell or not current_buy: continue
-
-                today = datetime.now(timezone.utc).date()
-                prices_7d = [h['averagePrice'] for h in price_history if h and all(k in h for k in ['date', 'averagePrice']) and h['averagePrice'] is not None and (today - datetime.fromisoformat(h['date']).date()).days < 7]
-                avg_7d = sum(prices_7d) / len(prices_7d) if prices_7d else current_sell
-                
-                prices_14d = [h['averagePrice'] for h in price_history if h and all(k in h for k in ['date', 'averagePrice']) and h['averagePrice'] is not None and (today - datetime.fromisoformat(h['date']).date()).days < 14]
-                avg_14d = sum(prices_14d) / len(prices_14d) if prices_14d else current_sell
-
-                analysis_results.append({
-                    "name": item.get("item", {}).get("name"),
-                    "undervalueRatio_7d(%)": round(((avg_7d - current_sell) / avg_7d) * 100, 2) if avg_7d > 0 else 0,
-                    "spread": current_sell - current_buy,
-                    "isSpreadProfitable_7d": (current_buy * (1-TRANSACTION_FEE) - current_sell) > (avg_7d * SPREAD_PROFIT_RATIO) if avg_7d > 0 else False,
-                    "currentLowestSellPrice": current_sell, "currentHighestBuyPrice": current_buy,
-                    "avgPrice_7d": round(avg_7d, 2), "avgPrice_14d": round(avg_14d, 2),
-                    "itemId": item_id,
-                    "assetUrl": item.get("item", {}).get("assetUrl")
-                })
-            except Exception as e:
-                 print(f"  - 아이템 데이터 처리 중 오류 (ID: {item_id}). 건너뜁니다. 오류: {e}")
+def listing_snapshots(items):
+    """후보들의 목록 시세를 변동 감지용 스냅숏({itemId: market_snapshot})으로 모읍니다."""
+    return {item['item']['itemId']: market_snapshot(item.get('marketData')) for item in items}
+
+def attach_item_metadata(client, metadata_template, items):
+    """후보의 이름, 종류, 태그, 이미지 주소를 채웁니다.
+
+    축소된 목록 응답에는 itemId와 시세만 들어 있으므로, 아이템 정보는 ItemMetadata 캐시에서 가져오고
+    캐시에 없는 아이템만 GetItemMetadata로 일괄 요청합니다. 받은 정보는 캐시에 저장되어 다음 실행부터는 요청하지 않습니다.
+    """
+    cache = client.cache
+    metadata, missing = {}, []
+    for item_id, info in {item['item']['itemId']: item['item'] for item in items}.items():
+        if info.get('name'):
+            # 원래 목록 템플릿으로 받은 후보에는 이미 정보가 들어 있습니다.
+            metadata[item_id] = info
+            continue
+        cached = cache.get_item_metadata(item_id) if cache is not None else None
+        if cached:
+            metadata[item_id] = cached
+        else:
+            missing.append(item_id)
+
+    if missing:
+        print(f"  - 아이템 정보: {len(missing) + len(metadata)}개 중 {len(missing)}개만 새로 요청합니다. (나머지는 캐시 사용)")
+        with METRICS.span("item_metadata"):
+            responses = client.execute_batched([build_operation(metadata_template, itemId=item_id) for item_id in missing])
+        fetched = []
+        for item_id, res in zip(missing, responses):
+            info = (((res or {}).get("data") or {}).get("game", {}).get("marketableItem") or {}).get("item")
+            if info and info.get("itemId"):
+                metadata[item_id] = info
+                fetched.append(info)
+        if cache is not None:
+            cache.put_item_metadata(fetched)
+
+    for item in items:
+        info = metadata.get(item['item']['itemId'])
+        if info:
+            item['item'] = dict(info, **item['item'])
+
+def score_candidates(store, item_list, available_ids, workers=1):
+    """가격 이력을 확보한 후보들의 저평가율과 스프레드 수익성을 계산해 저평가율 순으로 돌려줍니다.
+
+    workers가 2 이상이고 후보가 SCORING_CHUNK_SIZE보다 많으면, 가격 이력을 묶음으로 나눠 프로세스 풀에서 계산합니다.
+    묶음 결과를 원래 순서대로 이어 붙인 뒤 정렬하므로 순위는 한 프로세스에서 계산할 때와 같습니다.
+    각 결과에는 지표 엔진(indicators.py)이 이어서 계산한 EMA, 변동성, z-score, 거래량 지표도 붙입니다.
+    """
+    item_list = [item for item in item_list if item.get('item', {}).get('itemId') in available_ids]
+    series_map = store.get_series_many(item['item']['itemId'] for item in item_list)
+    engine = IndicatorEngine(store)
+    applied = engine.update(series_map)
+    if applied:
+        print(f"  - 지표: 새 가격 이력 {applied}줄을 반영했습니다.")
+    indicator_states = engine.get_many(series_map)
+    chunks = [item_list[i:i + SCORING_CHUNK_SIZE] for i in range(0, len(item_list), SCORING_CHUNK_SIZE)]
+
+    with METRICS.span("stage3_scoring"):
+        if workers > 1 and len(chunks) > 1:
+            with ProcessPoolExecutor(max_workers=min(workers, len(chunks))) as executor:
+                futures = [
+                    executor.submit(score_items, chunk, {item['item']['itemId']: series_map[item['item']['itemId']] for item in chunk})
+                    for chunk in chunks
+                ]
+                analysis_results = [result for future in futures for result in future.result()]
+        else:
+            analysis_results = score_items(item_list, series_map)
+        for result in analysis_results:
+            result.update(summarize(indicator_states.get(result["itemId"]), result["currentLowestSellPrice"]))
 
     analysis_results.sort(key=lambda x: x.get("undervalueRatio_7d(%)", 0), reverse=True)
     return analysis_results
 
+def score_items(item_list, series_map):
+    """가격 이력({itemId: PriceSeries})이 있는 아이템들의 분석 결과를 item_list 순서대로 돌려줍니다. (프로세스 풀에서도 실행됩니다)"""
+    analysis_results = []
+
+    # 분석 가능한 아이템과 현재 시세를 먼저 모은 뒤, 기간별 통계는 배열 연산으로 한 번에 계산합니다.
+    eligible = []
+    for item in item_list:
+        try:
+            item_id = item.get("item", {}).get("itemId")
+            if not item_id or item_id not in series_map:
+                continue
+
+            market_data = item.get("marketData")
+            if not market_data: continue
+            
+            sell_stats, buy_stats = market_data.get("sellStats"), market_data.get("buyStats")
+            if not sell_stats or not buy_stats: continue
+
+            current_sell = sell_stats[0].get("lowestPrice")
+            current_buy = buy_stats[0].get("highestPrice")
+            if not current_sell or not current_buy: continue
+
+            eligible.append((item, item_id, current_sell, current_buy, series_map[item_id]))
+        except Exception as e:
+             print(f"  - 아이템 데이터 처리 중 오류 (ID: {item_id}). 건너뜁니다. 오류: {e}")
+
+    stats = compute_window_stats([e[4] for e in eligible])
+    sells, buys = [e[2] for e in eligible], [e[3] for e in eligible]
+    # 기간 내 데이터가 없으면 현재 최저 판매가를 평균가로 사용합니다.
+    avg_7d_list = with_fallback(stats["avg_7d"], sells).tolist()
+    avg_14d_list = with_fallback(stats["avg_14d"], sells).tolist()
+    undervalue_ratio, is_spread_profitable = undervalue_and_spread(avg_7d_list, sells, buys, TRANSACTION_FEE, SPREAD_PROFIT_RATIO)
+
+    for i, (item, item_id, current_sell, current_buy, _) in enumerate(eligible):
+        avg_7d, avg_14d = avg_7d_list[i], avg_14d_list[i]
+        analysis_results.append({
+            "name": item.get("item", {}).get("name"),
+            "undervalueRatio_7d(%)": round(float(undervalue_ratio[i]), 2) if avg_7d > 0 else 0,
+            "spread": current_sell - current_buy,
+            "isSpreadProfitable_7d": bool(is_spread_profitable[i]),
+            "currentLowestSellPrice": current_sell, "currentHighestBuyPrice": current_buy,
+            "avgPrice_7d": round(avg_7d, 2), "avgPrice_14d": round(avg_14d, 2),
+            "itemId": item_id,
+            "assetUrl": item.get("item", {}).get("assetUrl")
+        })
+    return analysis_results
+
+# --- 파이프라인 모드: 1단계와 2단계를 동시에 진행 ---
+def run_pipeline(client, store, market_query, checkpoint=None, target=TARGET_ITEM_COUNT, workers=1, delta_refresh=DELTA_REFRESH,
+                 on_page=None):
+    """목록 페이지가 도착하는 대로 후보를 큐에 넣고, 곧바로 가격 이력 일괄 요청을 시작합니다.
+
+    목록 수집(생산자 스레드)과 심층 분석(소비자)이 같은 client의 요청 한도를 나눠 쓰므로
+    서로를 기다리지 않고 네트워크를 계속 사용합니다.
+    """
+    history_q = load_json_file(operation_path(GRAPHQL_DIR, 'GetItemPriceHistory.json'))
+    metadata_q = load_json_file(os.path.join(GRAPHQL_DIR, 'GetItemMetadata.json'))
+    if not history_q or not metadata_q: return []
+
+    candidate_queue = queue.Queue(maxsize=PIPELINE_QUEUE_SIZE)
+    done = object()
+    producer_errors = []
+
+    def produce():
+        try:
+            with METRICS.span("stage1_market_candidates"):
+                for page_candidates in iter_market_candidates(client, market_query, checkpoint, target, on_page):
+                    for item in page_candidates:
+                        if item.get('item'):
+                            candidate_queue.put(item)
+        except Exception as e:
+            # 목록 수집 스레드의 치명적인 오류(인증 만료 등)는 심층 분석이 끝난 뒤 main으로 다시 올려보냅니다.
+            producer_errors.append(e)
+        finally:
+            candidate_queue.put(done)
+
+    producer = threading.Thread(target=produce, daemon=True)
+    producer.start()
+
+    print("\n[2단계] 심층 분석 시작... (목록 수집과 동시에 진행)")
+    item_list, available_ids = [], set()
+    with METRICS.span("stage2_deep_dive"):
+        finished = False
+        while not finished:
+            # 하나가 도착할 때까지 기다린 뒤, 이미 도착한 후보를 묶음 크기만큼 모아 바로 요청합니다.
+            batch = [candidate_queue.get()]
+            while len(batch) < client.batch_sizer.size:
+                try:
+                    batch.append(candidate_queue.get_nowait())
+                except queue.Empty:
+                    break
+            if batch[-1] is done:
+                batch.pop()
+                finished = True
+            if not batch:
+                continue
+
+            item_list.extend(batch)
+            available_ids |= refresh_price_histories(client, store, history_q, [item['item']['itemId'] for item in batch],
+                                                     listing_snapshots(batch) if delta_refresh else None)
+
+    producer.join()
+    if producer_errors:
+        raise producer_errors[0]
+    if not item_list: return None
+    failed_count = len(item_list) - len(available_ids)
+    if failed_count:
+        print(f"    - 최대 재시도 후에도 {failed_count}개 아이템 처리 실패. 실패한 아이템은 건너뜁니다.")
+    attach_item_metadata(client, metadata_q, [item for item in item_list if item['item']['itemId'] in available_ids])
+    return score_candidates(store, item_list, available_ids, workers)
+
+def print_resume_hint(full_catalog):
+    resume_command = "python analyze_market.py --full-catalog --resume" if full_catalog else "python analyze_market.py --resume"
+    print(f"  - '{resume_command}'으로 다시 실행하면 받은 결과를 건너뛰고 이어서 진행합니다.")
+
 def main():
+    parser = argparse.ArgumentParser(description="시장 저평가 아이템 분석")
+    parser.add_argument("--resume", action="store_true", help="중단된 분석을 이어서 진행합니다 (이미 받은 최신 결과는 다시 요청하지 않음)")
+    parser.add_argument("--full-catalog", action="store_true", help=f"상위 {TARGET_ITEM_COUNT}개가 아니라 시장 전체 목록을 분석합니다 (점수 계산은 여러 프로세스로 진행)")
+    parser.add_argument("--workers", type=int, default=SCORING_WORKERS, help="--full-catalog에서 점수 계산에 쓸 프로세스 수")
+    parser.add_argument("--full-refresh", action="store_true", help="시세 변동과 관계없이 오래된 가격 이력을 모두 다시 받습니다")
+    args = parser.parse_args()
+    if args.workers < 1:
+        parser.error("--workers는 1 이상이어야 합니다.")
+
     config = load_json_file(CONFIG_FILE)
-    market_query = load_json_file(os.path.join(GRAPHQL_DIR, 'GetMarketableItems.json'))
+    market_query = load_json_file(operation_path(GRAPHQL_DIR, 'GetMarketableItems.json'))
     if not all([config, market_query]): return
 
-    headers = {"Authorization": config.get('uplay_token'), "Ubi-AppId": APP_ID, "Ubi-SessionId": config.get('ubi_session_id'), "Content-Type": "application/json", "Ubi-LocaleCode": "ko-KR"}
-    session = requests.Session()
+    cache = MarketCache()
+    client = GraphQLClient(build_headers(config, APP_ID), requests_per_second=1.0 / API_CALL_DELAY, batch_size=INITIAL_BATCH_SIZE, cache=cache)
     
+    # 1단계 후보 목록은 체크포인트 파일에, 2단계 가격 이력은 price_history.db에 도착하는 대로 저장됩니다.
+    # 전체 목록 모드는 후보 수 제한 없이 totalCount까지 훑고, 보고서와 체크포인트를 따로 둡니다.
+    if args.full_catalog:
+        target, workers, output_file = None, args.workers, FULL_CATALOG_OUTPUT_FILE
+        checkpoint = StageCheckpoint("market_catalog", resume=args.resume)
+    else:
+        target, workers, output_file = TARGET_ITEM_COUNT, 1, OUTPUT_FILE
+        checkpoint = StageCheckpoint("market_candidates", resume=args.resume)
+    delta_refresh = DELTA_REFRESH and not args.full_refresh
+    # alert_rules.json이 있으면 목록 페이지가 도착할 때마다, 그리고 분석이 끝난 뒤 알림 규칙을 검사합니다.
+    alerts = AlertEngine.load()
+    on_page = alerts.check_listing if alerts else None
+    store = PriceHistoryStore()
     try:
-        market_candidates = fetch_market_candidates(session, headers, market_query)
-        
-        all_items_map = {item['item']['itemId']: item for item in market_candidates if item.get('item')}
+        if PIPELINE_MODE:
+            final_report = run_pipeline(client, store, market_query, checkpoint, target, workers, delta_refresh, on_page)
+        else:
+            market_candidates = fetch_market_candidates(client, market_query, checkpoint, target, on_page)
+            all_items_map = {item['item']['itemId']: item for item in market_candidates if item.get('item')}
+            final_report = analyze_deep_dive(client, store, all_items_map, workers, delta_refresh) if all_items_map else None
         
-        if not all_items_map:
+        # 목록을 끝까지 받지 못했다면 일부 후보만으로 만든 보고서는 저장하지 않고,
+        # 중간 결과를 남겨 두어 --resume으로 이어서 받을 수 있게 합니다.
+        if not checkpoint.is_complete():
+            print("\n경고: 시장 목록을 끝까지 받지 못해 보고서를 저장하지 않습니다. (받은 가격 이력은 저장되어 있습니다)")
+            print_resume_hint(args.full_catalog)
+        elif final_report is None:
             print("\n분석할 아이템이 없습니다.")
+            checkpoint.clear()
         else:
-            final_report = analyze_deep_dive(session, headers, all_items_map)
-            save_json_file(final_report, OUTPUT_FILE)
+            save_json_file(final_report, output_file)
+            if alerts:
+                alerts.check_results(final_report)
+            checkpoint.clear()
             
     except Exception as e:
         print(f"\n치명적인 오류 발생: {e}")
+        print_resume_hint(args.full_catalog)
+    finally:
+        if alerts:
+            alerts.close()
+        store.close()
+        cache.report()
+        cache.close()
+        METRICS.write("analyze_market")
 
     print("\n모든 분석 작업이 완료되었습니다.")
 
@@ -0,0 +1,246 @@
+# benchmark.py (모의 GraphQL 서버로 세 스크립트의 처리 속도를 측정)
+#
+# 사용법: python benchmark.py [scraper analyze_market check_my_profits] [--runs 2] [--latency 0.1]
+#                            [--error-rate 0.05] [--rate-limit-rate 0.05] [--compare 이전결과.json] [--compare-variants]
+#   -> 스크립트별 소요 시간, 초당 요청 수, 재시도 수를 출력하고 reports/benchmark.json에 저장합니다.
+#      --compare-variants는 원래 쿼리(full)와 축소 쿼리(slim)로 각각 실행해 줄어든 전송량을 함께 보여줍니다.
+#      --check-batch-split은 측정 대신, 문제가 되는 작업이 섞인 묶음을 나눠 보낼 때 나머지 작업이 모두 성공하는지 점검합니다.
+#
+# 실제 서버에는 요청하지 않습니다. 스크립트마다 임시 작업 폴더에서 실행하므로
+# 작업 폴더의 config.json, 캐시, 거래 내역 파일은 건드리지 않습니다.
+
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import graphql_client
+from metrics import METRICS_DIR
+from mock_graphql_server import RESULTS_FIXTURE, TRANSACTIONS_FIXTURE, MockGraphQLServer
+from shared_rate_limiter import SharedRateLimiter
+
+# --- 상수 정의 ---
+SCRIPTS = ('scraper', 'analyze_market', 'check_my_profits')
+QUERY_VARIANTS = ('full', 'slim')
+GRAPHQL_DIR = 'graphql'
+REPORTS_DIR = 'reports'
+OUTPUT_FILE = os.path.join(REPORTS_DIR, 'benchmark.json')
+SCRIPT_TIMEOUT = 30 * 60
+BENCH_CONFIG = {"uplay_token": "Ubi_v1 t=benchmark", "ubi_session_id": "benchmark"}
+SPLIT_CHECK_SIZE = 20 # 묶음 나누기 점검에서 한 번에 보낼 작업 수
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+# --- 도우미 함수 ---
+def save_json_file(data, file_path):
+    os.makedirs(os.path.dirname(file_path), exist_ok=True)
+    with open(file_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+    print(f"\n성공: 벤치마크 결과가 '{file_path}'에 저장되었습니다.")
+
+def prepare_workdir(workdir):
+    """스크립트가 읽는 graphql 폴더와 가짜 config.json을 작업 폴더에 준비합니다."""
+    shutil.copytree(os.path.join(REPO_DIR, GRAPHQL_DIR), os.path.join(workdir, GRAPHQL_DIR), dirs_exist_ok=True)
+    with open(os.path.join(workdir, 'config.json'), 'w', encoding='utf-8') as f:
+        json.dump(BENCH_CONFIG, f)
+
+def run_script(script, server, workdir, query_variant='slim'):
+    """스크립트 하나를 실행하고 소요 시간과 서버가 받은 요청 통계를 돌려줍니다."""
+    server.reset_stats()
+    env = dict(os.environ, UBI_GRAPHQL_URL=server.url, UBI_QUERY_VARIANT=query_variant, PYTHONIOENCODING='utf-8')
+    started = time.perf_counter()
+    proc = subprocess.run([sys.executable, os.path.join(REPO_DIR, f"{script}.py")], cwd=workdir, env=env,
+                          capture_output=True, text=True, encoding='utf-8', timeout=SCRIPT_TIMEOUT)
+    wall_time = time.perf_counter() - started
+    stats = server.snapshot_stats()
+
+    if proc.returncode != 0 or "치명적인 오류" in proc.stdout:
+        print(f"  - 경고: {script} 실행 중 오류가 있었습니다. 마지막 출력:")
+        for line in (proc.stdout + proc.stderr).strip().splitlines()[-5:]:
+            print(f"      {line}")
+
+    # 스크립트가 남긴 단계별 지표(metrics.py)가 있으면 함께 기록합니다.
+    stages = {}
+    metrics_file = os.path.join(workdir, METRICS_DIR, f"{script}.json")
+    if os.path.exists(metrics_file):
+        with open(metrics_file, 'r', encoding='utf-8') as f:
+            stages = json.load(f).get("stages", {})
+
+    return {
+        "script": script,
+        "queryVariant": query_variant,
+        "wallTime": round(wall_time, 3),
+        "stages": stages,
+        "requests": stats["requests"],
+        "operations": stats["operations"],
+        "requestsPerSecond": round(stats["requests"] / wall_time, 3) if wall_time else None,
+        "operationsPerSecond": round(stats["operations"] / wall_time, 3) if wall_time else None,
+        "retries": stats["repeatedOperations"],
+        "injectedErrors": stats["injectedErrors"],
+        "injectedRateLimits": stats["injectedRateLimits"],
+        "bytesIn": stats["bytesIn"],
+        "bytesOut": stats["bytesOut"],
+        "exitCode": proc.returncode
+    }
+
+def print_result(run_no, result):
+    print(f"  [{run_no}회차] {result['script']} ({result['queryVariant']}): {result['wallTime']:.2f}초, 요청 {result['requests']}회 "
+          f"({result['requestsPerSecond']}회/초), 작업 {result['operations']}개, 재시도 {result['retries']}회, "
+          f"전송 {result['bytesIn']:,}B / 수신 {result['bytesOut']:,}B")
+    for stage, duration in result["stages"].items():
+        print(f"      - {stage}: {duration:.2f}초")
+
+def _result_key(result):
+    return (result["script"], result.get("queryVariant", "full"), result["run"])
+
+def summarize_variant_savings(results):
+    """같은 스크립트/회차의 full과 slim 결과를 비교해 줄어든 바이트 수를 출력하고 목록으로 돌려줍니다."""
+    by_key = {_result_key(r): r for r in results}
+    savings = []
+    print("\n[쿼리 축소 효과] full -> slim")
+    for result in results:
+        if result["queryVariant"] != "slim":
+            continue
+        full = by_key.get((result["script"], "full", result["run"]))
+        if not full:
+            continue
+        full_bytes = full["bytesIn"] + full["bytesOut"]
+        slim_bytes = result["bytesIn"] + result["bytesOut"]
+        saved = full_bytes - slim_bytes
+        savings.append({"script": result["script"], "run": result["run"], "fullBytes": full_bytes, "slimBytes": slim_bytes, "bytesSaved": saved})
+        ratio = saved / full_bytes * 100 if full_bytes else 0.0
+        print(f"  - {result['script']} ({result['run']}회차): {full_bytes:,}B -> {slim_bytes:,}B ({saved:,}B, {ratio:.1f}% 절약)")
+    return savings
+
+def compare_with(previous_file, results):
+    """이전 벤치마크 결과와 같은 스크립트/회차끼리 소요 시간과 처리량을 비교해 출력합니다."""
+    try:
+        with open(previous_file, 'r', encoding='utf-8') as f:
+            previous = {_result_key(r): r for r in json.load(f).get("results", [])}
+    except (OSError, json.JSONDecodeError) as e:
+        print(f"오류: 비교할 결과 '{previous_file}'를 읽지 못했습니다. (오류: {e})")
+        return
+    print(f"\n[비교] '{previous_file}' 대비")
+    for result in results:
+        before = previous.get(_result_key(result))
+        if not before or not before.get("wallTime"):
+            continue
+        time_change = (result["wallTime"] - before["wallTime"]) / before["wallTime"] * 100
+        print(f"  - {result['script']} ({result['run']}회차): {before['wallTime']:.2f}초 -> {result['wallTime']:.2f}초 ({time_change:+.1f}%), "
+              f"초당 요청 {before['requestsPerSecond']} -> {result['requestsPerSecond']}, 재시도 {before['retries']} -> {result['retries']}, "
+              f"수신 {before['bytesOut']:,}B -> {result['bytesOut']:,}B")
+
+def check_batch_split(args):
+    """문제가 되는 아이템을 묶음의 모든 위치에 하나씩 넣어 보고, 나머지 작업이 모두 성공하는지 확인합니다.
+
+    하나라도 실패한 위치가 있으면 False를 돌려줍니다.
+    """
+    with open(os.path.join(REPO_DIR, GRAPHQL_DIR, 'GetItemDetails.json'), 'r', encoding='utf-8') as f:
+        template = json.load(f)
+    failed_positions = []
+    with tempfile.TemporaryDirectory(prefix="bench_split_") as workdir:
+        server = MockGraphQLServer(port=0, results_file=args.results_fixture, transactions_file=args.transactions_fixture, latency=0.0)
+        item_ids = list(server.items)[:SPLIT_CHECK_SIZE]
+        if len(item_ids) < SPLIT_CHECK_SIZE:
+            print(f"오류: 묶음 나누기 점검에는 아이템이 {SPLIT_CHECK_SIZE}개 이상 필요합니다. (현재 {len(item_ids)}개)")
+            return False
+        server.start()
+        original_url = graphql_client.API_URL
+        graphql_client.API_URL = server.url
+        limiter = SharedRateLimiter(db_file=os.path.join(workdir, 'rate_limit.db'), requests_per_second=1000, burst=1000)
+        try:
+            operations = [graphql_client.build_operation(template, itemId=item_id) for item_id in item_ids]
+            for position, bad_item_id in enumerate(item_ids):
+                server.bad_item_ids = {bad_item_id}
+                client = graphql_client.GraphQLClient({}, requests_per_second=1000, batch_size=SPLIT_CHECK_SIZE,
+                                                      shared_limiter=limiter, retry_delay=0)
+                responses = client.execute_batched(operations)
+                lost = [i for i, res in enumerate(responses) if i != position and res is None]
+                if lost:
+                    failed_positions.append((position, lost))
+        finally:
+            graphql_client.API_URL = original_url
+            limiter.close()
+            server.stop()
+
+    print(f"\n[묶음 나누기 점검] 작업 {SPLIT_CHECK_SIZE}개 중 하나씩 실패시킴")
+    for position, lost in failed_positions:
+        print(f"  - 실패: {position}번 위치가 문제일 때 정상 작업 {lost}도 결과가 없습니다.")
+    if failed_positions:
+        return False
+    print(f"  - 통과: 모든 위치({SPLIT_CHECK_SIZE}곳)에서 나머지 {SPLIT_CHECK_SIZE - 1}개 작업이 성공했습니다.")
+    return True
+
+# --- 메인 로직 ---
+def main():
+    parser = argparse.ArgumentParser(description="모의 GraphQL 서버로 스크립트 처리 속도를 측정합니다.")
+    parser.add_argument("scripts", nargs="*", default=list(SCRIPTS), metavar="SCRIPT",
+                        help=f"측정할 스크립트 ({', '.join(SCRIPTS)}; 기본: 전체)")
+    parser.add_argument("--runs", type=int, default=1, help="같은 작업 폴더에서 반복 실행할 횟수 (2회차부터 캐시/증분 동기화 효과 측정)")
+    parser.add_argument("--latency", type=float, default=0.05, help="일괄 요청당 응답 지연 (초)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="HTTP 503으로 실패시킬 일괄 요청 비율")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="RATE_LIMIT 오류를 돌려줄 일괄 요청 비율")
+    parser.add_argument("--retry-after", type=int, default=1, help="RATE_LIMIT 오류에 담을 대기 시간 (초)")
+    parser.add_argument("--seed", type=int, default=0, help="오류 주입 난수 시드")
+    parser.add_argument("--results-fixture", default=os.path.join(REPO_DIR, RESULTS_FIXTURE), help="아이템 응답 자료 (results.json)")
+    parser.add_argument("--transactions-fixture", default=os.path.join(REPO_DIR, TRANSACTIONS_FIXTURE), help="거래 내역 응답 자료 (transactions.json)")
+    parser.add_argument("--label", default=None, help="결과에 남길 버전 이름 (기본: 실행 시각)")
+    parser.add_argument("--output", default=OUTPUT_FILE, help="결과를 저장할 파일")
+    parser.add_argument("--compare", default=None, help="비교할 이전 벤치마크 결과 파일")
+    parser.add_argument("--compare-variants", action="store_true", help="원래 쿼리(full)와 축소 쿼리(slim)로 각각 실행해 전송량을 비교합니다")
+    parser.add_argument("--check-batch-split", action="store_true",
+                        help="측정 대신, 요청 전체가 실패한 묶음을 나눠 보낼 때 정상 작업이 모두 성공하는지 점검합니다")
+    args = parser.parse_args()
+    if args.check_batch_split:
+        sys.exit(0 if check_batch_split(args) else 1)
+    unknown = [script for script in args.scripts if script not in SCRIPTS]
+    if unknown:
+        parser.error(f"알 수 없는 스크립트: {', '.join(unknown)} (선택: {', '.join(SCRIPTS)})")
+
+    server = MockGraphQLServer(port=0, results_file=args.results_fixture, transactions_file=args.transactions_fixture,
+                               latency=args.latency, error_rate=args.error_rate, rate_limit_rate=args.rate_limit_rate,
+                               retry_after=args.retry_after, seed=args.seed).start()
+    print(f"모의 GraphQL 서버 시작: {server.url} (지연 {args.latency}초, 오류 {args.error_rate:.0%}, RATE_LIMIT {args.rate_limit_rate:.0%})")
+
+    # 변형마다 새 작업 폴더에서 실행하므로 캐시 상태가 같은 조건에서 비교됩니다.
+    query_variants = QUERY_VARIANTS if args.compare_variants else ('slim',)
+    results = []
+    try:
+        for script in args.scripts:
+            print(f"\n[{script}] 측정 시작...")
+            for query_variant in query_variants:
+                with tempfile.TemporaryDirectory(prefix=f"bench_{script}_") as workdir:
+                    prepare_workdir(workdir)
+                    for run_no in range(1, args.runs + 1):
+                        result = run_script(script, server, workdir, query_variant)
+                        result["run"] = run_no
+                        print_result(run_no, result)
+                        results.append(result)
+    finally:
+        server.stop()
+
+    report = {
+        "label": args.label or datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        "settings": {
+            "latency": args.latency,
+            "errorRate": args.error_rate,
+            "rateLimitRate": args.rate_limit_rate,
+            "retryAfter": args.retry_after,
+            "seed": args.seed
+        },
+        "results": results
+    }
+    if args.compare_variants:
+        report["variantSavings"] = summarize_variant_savings(results)
+    save_json_file(report, args.output)
+    if args.compare:
+        compare_with(args.compare, results)
+
+
+if __name__ == "__main__":
+    main()
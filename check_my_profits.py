@@ -1,28 +1,30 @@
 import json
 import os
-import re
-import time
-from datetime import datetime, timedelta, timezone
 
-try:
-    from curl_cffi import requests
-except ImportError:
-    print("오류: curl_cffi 라이브러리를 찾을 수 없습니다. 'pip install curl_cffi'를 실행해주세요.")
-    exit()
+from graphql_client import GraphQLClient, build_headers, build_operation, operation_path
+from market_cache import MarketCache
+from metrics import METRICS
+from indicators import IndicatorEngine, summarize
+from position_ledger import PositionLedger
+from price_stats import compute_window_stats, to_optional, with_fallback
+from price_store import PriceHistoryStore, extract_price_history, is_history_response
+from trade_sync import load_trades, sync_trades
 
 # --- 상수 및 설정 ---
 CONFIG_FILE = 'config.json'
 GRAPHQL_DIR = 'graphql'
 REPORTS_DIR = 'reports'
 OUTPUT_FILE = os.path.join(REPORTS_DIR, 'my_profits_report.json')
-API_URL = "https://public-ubiservices.ubi.com/v1/profiles/me/uplay/graphql"
+TRANSACTIONS_FILE = 'transactions.json' # 'transactions.ndjson'으로 바꾸면 줄 단위(NDJSON) 저장소를 사용합니다
 APP_ID = "80a4a0e8-8797-440f-8f4c-eaba87d0fdda"
 
 # --- 사용자 설정 ---
 TRANSACTION_FEE = 0.10
-API_CALL_DELAY = 1.0
-MAX_RETRIES = 5
-RETRY_DELAY = 10
+API_CALL_DELAY = 1.0 # 요청 사이 최소 간격 (초)
+INITIAL_BATCH_SIZE = 10 # 한 번에 요청할 작업 개수의 초기값 (응답 속도에 따라 자동 조절)
+MAX_CONCURRENT_REQUESTS = 2 # 동시에 진행할 일괄 요청 수
+FULL_SYNC = False # True이면 거래 내역을 증분 동기화하지 않고 처음부터 모두 다시 받습니다
+COST_BASIS_METHOD = 'fifo' # 매수가 계산 방식: 'fifo'(먼저 산 것부터 판매) 또는 'average'(평균 단가)
 
 # --- 도우미 함수 ---
 def load_json_file(file_path):
@@ -42,138 +44,79 @@ def save_json_file(data, file_path):
         json.dump(data, f, ensure_ascii=False, indent=2)
     print(f"\n성공: 최종 분석 보고서가 '{file_path}'에 저장되었습니다.")
 
-def make_api_call(session, headers, payload):
-    if not isinstance(payload, list):
-        payload = [payload]
-    response = session.post(API_URL, headers=headers, json=payload, timeout=60, impersonate="chrome110")
-    if response.status_code == 401:
-        raise Exception("인증 실패(401)")
-    response.raise_for_status()
-    return response.json()
-
 # --- 1단계: 현재 보유 자산 및 매수가 확정 ---
-def fetch_my_current_assets(session, headers, query):
+def fetch_my_current_assets(client, query, ledger):
+    """새로 받은 거래만 보유 자산 장부(positions.db)에 반영하고, 현재 보유 자산을 돌려줍니다."""
     print("\n[1단계] 나의 모든 거래 내역 수집 시작...")
-    all_trades = []
-    offset = 0
-    limit = 100
-    while True:
-        query["variables"]["offset"] = offset
-        try:
-            res = make_api_call(session, headers, query)[0]
-            trades = res.get("data", {}).get("game", {}).get("viewer", {}).get("meta", {}).get("trades")
-            if not trades or not trades.get("nodes"):
-                break
-            
-            # 성공한 거래만 필터링
-            successful_trades = [t for t in trades["nodes"] if t.get("state") == "Succeeded"]
-            all_trades.extend(successful_trades)
-            
-            if len(trades["nodes"]) < limit:
-                break
-            offset += limit
-            time.sleep(API_CALL_DELAY)
-        except Exception as e:
-            print(f"  - 거래 내역 수집 중 오류: {e}")
-            break
-    
-    print(f"  - 총 {len(all_trades)}건의 성공한 거래 내역 확인.")
-    
-    # 시간순(오래된 순)으로 정렬하여 현재 보유 자산을 확정
-    all_trades.sort(key=lambda x: x.get("lastModifiedAt", ""))
-    
-    current_assets = {}
-    for trade in all_trades:
-        item_info = trade.get("tradeItems", [{}])[0].get("item", {})
-        item_id = item_info.get("itemId")
-        if not item_id: continue
-        
-        category = trade.get("category")
-        if category == "Buy":
-            payment_info = trade.get("payment")
-            if not payment_info: continue
-            
-            current_assets[item_id] = {
-                "name": item_info.get("name"),
-                "assetUrl": item_info.get("assetUrl"),
-                "myBuyPrice": payment_info.get("price"),
-                "buyDate": trade.get("lastModifiedAt")
-            }
-        elif category == "Sell":
-            if item_id in current_assets:
-                del current_assets[item_id]
-
-    print(f"  - 현재 보유 자산 {len(current_assets)} 종류 확정.")
+    try:
+        stored_trades, new_trades = sync_trades(client, query, TRANSACTIONS_FILE, full=FULL_SYNC)
+    except Exception as e:
+        print(f"  - 거래 내역 동기화 중 오류: {e}. 저장된 거래 내역으로 계속합니다.")
+        stored_trades = load_trades(TRANSACTIONS_FILE)
+        new_trades = stored_trades # 이미 반영한 거래는 장부가 건너뜁니다
+
+    if ledger.needs_rebuild():
+        print(f"  - 보유 자산 장부를 전체 거래 {len(stored_trades)}건으로 새로 만듭니다. (방식: {ledger.method})")
+        applied_count = ledger.rebuild(stored_trades)
+    else:
+        applied_count = ledger.apply(new_trades)
+    print(f"  - 성공한 거래 {applied_count}건을 장부에 새로 반영했습니다.")
+
+    current_assets = ledger.open_positions()
+    realized_count, realized_profit = ledger.realized_summary(TRANSACTION_FEE)
+    print(f"  - 현재 보유 자산 {len(current_assets)} 종류({sum(a['quantity'] for a in current_assets.values())}개) 확정. "
+          f"실현 손익: 판매 {realized_count}건, {realized_profit:+,.2f}")
     return current_assets
 
 # --- 2단계: 보유 자산 현재 시세 및 과거 데이터 조회 ---
-def fetch_assets_market_data(session, headers, asset_ids):
+def fetch_assets_market_data(client, store, asset_ids):
     print("\n[2단계] 보유 자산의 시장 데이터 조회 시작...")
-    history_q_template = load_json_file(os.path.join(GRAPHQL_DIR, 'GetItemPriceHistory.json'))
+    history_q_template = load_json_file(operation_path(GRAPHQL_DIR, 'GetItemPriceHistory.json'))
     details_q_template = load_json_file(os.path.join(GRAPHQL_DIR, 'GetItemDetails.json'))
     if not history_q_template or not details_q_template:
         return None
 
     market_data_map = {}
-    batch_size = 10
-    id_batches = [asset_ids[i:i + batch_size] for i in range(0, len(asset_ids), batch_size)]
-
-    for id_batch in id_batches:
-        # --- 요청 1: 가격 이력(History)만 일괄 조회 ---
-        history_payloads = []
-        for item_id in id_batch:
-            h_vars = history_q_template["variables"].copy()
-            h_vars["itemId"] = item_id
-            history_payloads.append(dict(history_q_template, variables=h_vars))
-        
-        print(f"  - {len(id_batch)}개 아이템의 [가격 이력] 요청...")
-        try:
-            history_responses = make_api_call(session, headers, history_payloads)
-            
-            # 성공한 응답만 임시 저장
-            temp_history_data = {}
-            for i, res in enumerate(history_responses):
-                item_id = id_batch[i]
-                if res and not res.get("errors"):
-                    temp_history_data[item_id] = res.get("data", {}).get("game", {}).get("marketableItem", {}).get("priceHistory", [])
-                else:
-                    print(f"    - 가격 이력 조회 실패 (ID: {item_id})")
-
-        except Exception as e:
-            print(f"  - [가격 이력] API 호출 중 오류 발생. 이 묶음을 건너뜁니다: {e}")
-            continue # 이 묶음 전체 실패 시 다음 묶음으로
-            
-        time.sleep(API_CALL_DELAY)
-
-        # --- 요청 2: 현재 시세(Details)만 일괄 조회 ---
-        details_payloads = []
-        for item_id in id_batch:
-            d_vars = details_q_template["variables"].copy()
-            d_vars["itemId"] = item_id
-            details_payloads.append(dict(details_q_template, variables=d_vars))
-        
-        print(f"  - {len(id_batch)}개 아이템의 [현재 시세] 요청...")
-        try:
-            details_responses = make_api_call(session, headers, details_payloads)
-
-            # 성공한 응답을 취합하여 최종 데이터맵 구성
-            for i, res in enumerate(details_responses):
-                item_id = id_batch[i]
-                # 가격 이력과 현재 시세가 모두 성공적으로 조회된 경우에만 최종 데이터에 추가
-                if item_id in temp_history_data and res and not res.get("errors"):
-                    market_data_map[item_id] = {
-                        "priceHistory": temp_history_data[item_id],
-                        "marketData": res.get("data", {}).get("game", {}).get("marketableItem", {}).get("marketData", {})
-                    }
-                else:
-                     print(f"    - 현재 시세 조회 실패 또는 가격 이력 없음 (ID: {item_id})")
-
-        except Exception as e:
-            print(f"  - [현재 시세] API 호출 중 오류 발생. 이 묶음을 건너뜁니다: {e}")
-            continue # 이 묶음 전체 실패 시 다음 묶음으로
-
-        time.sleep(API_CALL_DELAY)
+
+    # 아이템마다 현재 시세(Details)와, 로컬 저장소에서 오래된 경우 가격 이력(History)을
+    # 같은 일괄 요청에 담습니다. 실패한 작업만 다시 요청되므로 한쪽만 실패해도 다른 쪽은 유지됩니다.
+    stale_ids = set(store.stale_item_ids(asset_ids))
+    operations = []
+    details_index, history_index = {}, {}
+    for item_id in asset_ids:
+        details_index[item_id] = len(operations)
+        operations.append(build_operation(details_q_template, itemId=item_id))
+        if item_id in stale_ids:
+            history_index[item_id] = len(operations)
+            operations.append(build_operation(history_q_template, itemId=item_id))
+
+    print(f"  - {len(asset_ids)}개 아이템의 [현재 시세]와 {len(stale_ids)}개 아이템의 [가격 이력] 요청...")
+    responses = client.execute_batched(operations, max_workers=MAX_CONCURRENT_REQUESTS)
+
+    for item_id in asset_ids:
+        if item_id in history_index:
+            history_res = responses[history_index[item_id]]
+            if is_history_response(history_res):
+                store.upsert(item_id, extract_price_history(history_res))
+            else:
+                print(f"    - 가격 이력 조회 실패, 저장된 이력으로 계산합니다 (ID: {item_id})")
+
+        details_res = responses[details_index[item_id]]
+        if details_res is None:
+            print(f"    - 현재 시세 조회 실패 (ID: {item_id})")
+            continue
+        market_data_map[item_id] = {
+            "priceHistory": store.get_series(item_id), # PriceSeries (price_series.py)
+            "indicators": None,
+            "marketData": details_res.get("data", {}).get("game", {}).get("marketableItem", {}).get("marketData", {})
+        }
         
+    # 새로 받은 이력만 지표 상태에 이어서 반영합니다.
+    indicator_engine = IndicatorEngine(store)
+    indicator_engine.update(market_data_map)
+    for item_id, state in indicator_engine.get_many(market_data_map).items():
+        market_data_map[item_id]["indicators"] = state
+
     print(f"\n  - 최종적으로 {len(market_data_map)}개 자산의 시장 데이터 조회 완료.")
     return market_data_map
 
@@ -193,12 +136,22 @@ def analyze_and_generate_report(current_assets, market_data_map):
             "isProfitable": net_profit > 0
         }
 
+    def _current_sell(market_data):
+        sell_stats_list = (market_data or {}).get("sellStats")
+        return sell_stats_list[0].get("lowestPrice") if sell_stats_list else None
+
+    # 모든 보유 자산의 기간별 통계를 배열 연산으로 한 번에 계산하고, 데이터가 없는 칸은 현재 최저 판매가로 채웁니다.
+    stats_ids = [item_id for item_id in current_assets if item_id in market_data_map]
+    stats = compute_window_stats([market_data_map[item_id]["priceHistory"] for item_id in stats_ids])
+    sells = [_current_sell(market_data_map[item_id].get("marketData")) for item_id in stats_ids]
+    windows = {key: to_optional(with_fallback(stats[key], sells)) for key in ("avg_7d", "avg_14d", "avg_high_7d", "avg_high_14d")}
+    stats_index = {item_id: i for i, item_id in enumerate(stats_ids)}
+
     for item_id, asset_info in current_assets.items():
         if item_id not in market_data_map:
             continue
 
         data = market_data_map[item_id]
-        price_history = data.get("priceHistory", [])
         market_data = data.get("marketData", {})
         
         # 'None' 또는 빈 리스트인 경우를 안전하게 처리하도록 수정
@@ -212,25 +165,10 @@ def analyze_and_generate_report(current_assets, market_data_map):
         current_buy = buy_stats.get("highestPrice")
         my_buy_price = asset_info["myBuyPrice"]
 
-        today = datetime.now(timezone.utc).date()
-        
-        # 기간별 가격 데이터 추출
-        prices_7d = [h for h in price_history if h and h.get('date') and (today - datetime.fromisoformat(h['date']).date()).days < 7]
-        prices_14d = [h for h in price_history if h and h.get('date') and (today - datetime.fromisoformat(h['date']).date()).days < 14]
-
-        # 7일/14일 평균가 계산
-        avg_prices_7d = [p['averagePrice'] for p in prices_7d if p.get('averagePrice') is not None]
-        avg_7d = sum(avg_prices_7d) / len(avg_prices_7d) if avg_prices_7d else current_sell
-        
-        avg_prices_14d = [p['averagePrice'] for p in prices_14d if p.get('averagePrice') is not None]
-        avg_14d = sum(avg_prices_14d) / len(avg_prices_14d) if avg_prices_14d else current_sell
-
-        # 7일/14일 '일일 최고가'의 평균 계산
-        high_prices_7d = [p['highestPrice'] for p in prices_7d if p.get('highestPrice') is not None]
-        avg_high_7d = sum(high_prices_7d) / len(high_prices_7d) if high_prices_7d else current_sell
-
-        high_prices_14d = [p['highestPrice'] for p in prices_14d if p.get('highestPrice') is not None]
-        avg_high_14d = sum(high_prices_14d) / len(high_prices_14d) if high_prices_14d else current_sell
+        # 7일/14일 평균가와 '일일 최고가'의 평균 (데이터가 없으면 현재 최저 판매가)
+        i = stats_index[item_id]
+        avg_7d, avg_14d = windows["avg_7d"][i], windows["avg_14d"][i]
+        avg_high_7d, avg_high_14d = windows["avg_high_7d"][i], windows["avg_high_14d"][i]
 
         # 각 기준별 수익성 분석
         profitability = {
@@ -245,12 +183,15 @@ def analyze_and_generate_report(current_assets, market_data_map):
             "assetUrl": asset_info["assetUrl"],
             "myBuyPrice": my_buy_price,
             "buyDate": asset_info["buyDate"],
+            "quantity": asset_info["quantity"],
+            "lots": asset_info["lots"],
             "currentLowestSellPrice": current_sell,
             "currentHighestBuyPrice": current_buy,
             "avgPrice_7d": round(avg_7d, 2) if avg_7d is not None else None,
             "avgPrice_14d": round(avg_14d, 2) if avg_14d is not None else None,
             "avgHighestPrice_7d": round(avg_high_7d, 2) if avg_high_7d is not None else None,
             "avgHighestPrice_14d": round(avg_high_14d, 2) if avg_high_14d is not None else None,
+            "indicators": summarize(data["indicators"], current_sell),
             "estimatedProfitability": profitability
         })
 
@@ -265,28 +206,43 @@ def main():
     if not config or not tx_history_query:
         return
 
-    headers = {"Authorization": config.get('uplay_token'), "Ubi-AppId": APP_ID, "Ubi-SessionId": config.get('ubi_session_id'), "Content-Type": "application/json", "Ubi-LocaleCode": "ko-KR"}
-    session = requests.Session()
+    cache = MarketCache()
+    client = GraphQLClient(build_headers(config, APP_ID), requests_per_second=1.0 / API_CALL_DELAY, batch_size=INITIAL_BATCH_SIZE, cache=cache)
 
     try:
-        current_assets = fetch_my_current_assets(session, headers, tx_history_query)
+        with METRICS.span("stage1_transactions"):
+            ledger = PositionLedger(COST_BASIS_METHOD)
+            try:
+                current_assets = fetch_my_current_assets(client, tx_history_query, ledger)
+            finally:
+                ledger.close()
         
         if not current_assets:
             print("\n분석할 보유 자산이 없습니다.")
             return
 
         asset_ids = list(current_assets.keys())
-        market_data_map = fetch_assets_market_data(session, headers, asset_ids)
+        store = PriceHistoryStore()
+        try:
+            with METRICS.span("stage2_market_data"):
+                market_data_map = fetch_assets_market_data(client, store, asset_ids)
+        finally:
+            store.close()
 
         if not market_data_map:
             print("\n보유 자산의 시장 데이터를 조회하지 못했습니다.")
             return
 
-        final_report = analyze_and_generate_report(current_assets, market_data_map)
+        with METRICS.span("stage3_report"):
+            final_report = analyze_and_generate_report(current_assets, market_data_map)
         save_json_file(final_report, OUTPUT_FILE)
 
     except Exception as e:
         print(f"\n치명적인 오류 발생: {e}")
+    finally:
+        cache.report()
+        cache.close()
+        METRICS.write("check_my_profits")
 
     print("\n모든 분석 작업이 완료되었습니다.")
 
@@ -0,0 +1,53 @@
+# checkpoint.py (긴 분석 작업의 단계별 중간 결과 저장 및 이어서 실행)
+
+import os
+import time
+
+from ndjson_store import append_records, iter_records
+
+# --- 상수 정의 ---
+CHECKPOINT_DIR = os.path.join('reports', 'checkpoints')
+CHECKPOINT_MAX_AGE = 60 * 60 # 이 시간(초)보다 오래된 중간 결과는 이어서 쓰지 않습니다
+
+
+class StageCheckpoint:
+    """한 단계의 결과를 도착하는 대로 NDJSON 파일에 덧붙여 두는 중간 저장소.
+
+    resume=False이면 이전 중간 결과를 지우고 새로 시작합니다. resume=True이면
+    CHECKPOINT_MAX_AGE 안에 시작된 중간 결과만 이어서 사용합니다.
+    """
+
+    def __init__(self, stage_name, resume=False, max_age=CHECKPOINT_MAX_AGE, checkpoint_dir=CHECKPOINT_DIR):
+        os.makedirs(checkpoint_dir, exist_ok=True)
+        self.path = os.path.join(checkpoint_dir, f"{stage_name}.ndjson")
+        self.max_age = max_age
+        if not resume:
+            self.clear()
+
+    def records(self):
+        """저장된 결과를 저장 순서대로 돌려줍니다. 첫 기록이 너무 오래되었으면 모두 버립니다."""
+        if not os.path.exists(self.path):
+            return []
+        records = list(iter_records(self.path))
+        if records and time.time() - records[0].get("savedAt", 0) > self.max_age:
+            print(f"  - 중간 결과 '{self.path}'가 오래되어 처음부터 다시 시작합니다.")
+            self.clear()
+            return []
+        return records
+
+    def append(self, record):
+        append_records(self.path, [dict(record, savedAt=time.time())])
+
+    def mark_complete(self):
+        """단계가 끝까지 진행되었음을 기록합니다."""
+        self.append({"complete": True})
+
+    def is_complete(self):
+        """mark_complete()로 완료가 기록되었는지 돌려줍니다. 완료되지 않은 중간 결과는 지우지 말고 이어서 써야 합니다."""
+        if not os.path.exists(self.path):
+            return False
+        return any(record.get("complete") for record in iter_records(self.path))
+
+    def clear(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
@@ -0,0 +1,289 @@
+# graphql_client.py (세 스크립트가 함께 쓰는 GraphQL 클라이언트)
+
+import json
+import os
+import re
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+from metrics import METRICS
+from shared_rate_limiter import SharedRateLimiter
+
+try:
+    from curl_cffi import requests
+except ImportError:
+    print("오류: curl_cffi 라이브러리를 찾을 수 없습니다. 'pip install curl_cffi'를 실행해주세요.")
+    exit()
+
+# --- 상수 정의 ---
+# UBI_GRAPHQL_URL 환경 변수로 다른 서버(벤치마크용 모의 서버 등)를 지정할 수 있습니다.
+API_URL = os.environ.get("UBI_GRAPHQL_URL", "https://public-ubiservices.ubi.com/v1/profiles/me/uplay/graphql")
+# 'slim'이면 graphql/slim/에 축소 변형이 있는 작업은 그 변형을 사용합니다. 'full'이면 항상 원래 템플릿을 씁니다.
+QUERY_VARIANT = os.environ.get("UBI_QUERY_VARIANT", "slim")
+SLIM_QUERY_DIR = 'slim'
+REQUEST_TIMEOUT = 60
+# 같은 폴더에서 동시에 실행되는 스크립트들이 rate_limit.db의 요청 한도를 나눠 씁니다. '0'이면 사용하지 않습니다.
+SHARED_RATE_LIMIT = os.environ.get("UBI_SHARED_RATE_LIMIT", "1") != "0"
+MAX_RETRIES = 5   # 작업별 최대 재시도 횟수
+RETRY_DELAY = 10  # 서버가 대기 시간을 알려주지 않았을 때의 재시도 대기 시간 (초)
+
+# --- 적응형 묶음 크기 설정 ---
+MIN_BATCH_SIZE = 1
+MAX_BATCH_SIZE = 40
+TARGET_LATENCY = 5.0 # 한 번의 일괄 요청이 이 시간(초) 안에 끝나면 묶음을 키우고, 넘으면 줄입니다.
+
+
+class AuthError(Exception):
+    """토큰/세션 ID가 만료되어 더 진행할 수 없을 때 발생합니다."""
+
+
+# --- 도우미 함수 ---
+def build_headers(config, app_id):
+    """config.json 내용으로 요청 헤더를 만듭니다. 모든 응답은 한글로 받습니다."""
+    return {
+        "Authorization": config.get('uplay_token'),
+        "Ubi-AppId": app_id,
+        "Ubi-SessionId": config.get('ubi_session_id'),
+        "Content-Type": "application/json",
+        "Ubi-LocaleCode": "ko-KR"
+    }
+
+def build_operation(query_template, **variables):
+    """템플릿을 변경하지 않고 variables만 바꾼 요청 사본을 만듭니다."""
+    return dict(query_template, variables=dict(query_template["variables"], **variables))
+
+def operation_path(graphql_dir, file_name):
+    """작업 템플릿 경로를 돌려줍니다. 축소 변형(필요한 필드만 요청)이 있고 QUERY_VARIANT가 'slim'이면 그 경로입니다."""
+    slim_path = os.path.join(graphql_dir, SLIM_QUERY_DIR, file_name)
+    if QUERY_VARIANT == "slim" and os.path.exists(slim_path):
+        return slim_path
+    return os.path.join(graphql_dir, file_name)
+
+def parse_retry_delay(error_str, default=RETRY_DELAY):
+    """'RATE_LIMIT ... try again in N' 오류라면 서버가 요청한 대기 시간을, 아니면 기본값을 돌려줍니다."""
+    if "RATE_LIMIT" in error_str:
+        match = re.search(r'try again in (\d+)', error_str)
+        if match:
+            return int(match.group(1)) + 1
+    return default
+
+
+class RateLimiter:
+    """여러 작업자가 공유하는 요청 속도 제한기. 요청 사이 최소 간격을 보장합니다."""
+
+    def __init__(self, requests_per_second):
+        self.interval = 1.0 / requests_per_second
+        self._lock = threading.Lock()
+        self._next_slot = 0.0
+
+    def acquire(self):
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot)
+            self._next_slot = slot + self.interval
+        delay = slot - time.monotonic()
+        if delay > 0:
+            METRICS.record_sleep(delay)
+            time.sleep(delay)
+
+    def pause(self, seconds):
+        """서버가 대기를 요청하면 모든 작업자의 다음 요청을 함께 미룹니다."""
+        with self._lock:
+            self._next_slot = max(self._next_slot, time.monotonic() + seconds)
+
+
+class AdaptiveBatchSizer:
+    """응답 시간과 RATE_LIMIT 오류를 보고 한 번에 보낼 작업 수를 조절합니다.
+
+    빠르게 성공하면 조금씩 키우고, 느리거나 RATE_LIMIT에 걸리면 크게 줄입니다 (AIMD).
+    """
+
+    def __init__(self, initial_size, min_size=MIN_BATCH_SIZE, max_size=MAX_BATCH_SIZE, target_latency=TARGET_LATENCY):
+        self.min_size = min_size
+        self.max_size = max_size
+        self.target_latency = target_latency
+        self._size = max(min_size, min(max_size, initial_size))
+        self._lock = threading.Lock()
+
+    @property
+    def size(self):
+        return self._size
+
+    def record_success(self, batch_len, latency):
+        with self._lock:
+            if latency > self.target_latency:
+                self._size = max(self.min_size, self._size * 3 // 4)
+            elif batch_len >= self._size and latency < self.target_latency / 2:
+                self._size = min(self.max_size, self._size + max(1, self._size // 4))
+
+    def record_rate_limit(self):
+        with self._lock:
+            self._size = max(self.min_size, self._size // 2)
+
+
+class GraphQLClient:
+    """세션을 재사용하며 GraphQL 작업을 일괄 요청으로 묶어 보내는 클라이언트."""
+
+    def __init__(self, headers, requests_per_second=1.0, batch_size=10, max_retries=MAX_RETRIES, timeout=REQUEST_TIMEOUT, cache=None,
+                 shared_limiter=None, retry_delay=RETRY_DELAY):
+        self.headers = headers
+        self.cache = cache # market_cache.MarketCache (선택)
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+        # 스크립트 자신의 요청 간격을 지킨 뒤, 다른 스크립트와 함께 쓰는 한도에서도 토큰을 받습니다.
+        self.rate_limiter = RateLimiter(requests_per_second)
+        if shared_limiter is None and SHARED_RATE_LIMIT:
+            shared_limiter = SharedRateLimiter()
+        self.shared_limiter = shared_limiter
+        self.batch_sizer = AdaptiveBatchSizer(batch_size)
+        self.retry_count = 0
+        # curl_cffi 세션은 스레드 간에 공유하지 않고 스레드마다 하나씩 재사용합니다.
+        self._local = threading.local()
+
+    def _session(self):
+        session = getattr(self._local, "session", None)
+        if session is None:
+            session = requests.Session()
+            self._local.session = session
+        return session
+
+    def post(self, payloads):
+        """작업 목록을 한 번의 요청으로 보내고, 요청 순서대로 응답 목록을 돌려줍니다."""
+        self.rate_limiter.acquire()
+        if self.shared_limiter is not None:
+            self.shared_limiter.acquire()
+        body = json.dumps(payloads).encode('utf-8')
+        started = time.monotonic()
+        try:
+            response = self._session().post(API_URL, headers=self.headers, data=body, timeout=self.timeout, impersonate="chrome110")
+        except Exception:
+            METRICS.record_request(time.monotonic() - started, len(body), 0, len(payloads), failed=True)
+            raise
+        # 묶음 크기 조절에는 속도 제한 대기를 뺀 서버 응답 시간만 씁니다 (재시도 대기 때문에 묶음이 줄지 않도록).
+        self._local.latency = time.monotonic() - started
+        METRICS.record_request(self._local.latency, len(body), len(response.content), len(payloads), failed=response.status_code >= 400)
+        if response.status_code == 401:
+            raise AuthError("인증 실패(401). 'config.json'의 토큰/세션 ID가 만료되었습니다.")
+        response.raise_for_status()
+
+        responses = response.json()
+        if not isinstance(responses, list):
+            responses = [responses]
+        if len(responses) != len(payloads):
+            raise ValueError(f"API 응답 개수({len(responses)})가 요청 개수({len(payloads)})와 다릅니다.")
+        return responses
+
+    def execute(self, operation):
+        """단일 작업을 보내고 응답을 돌려줍니다. GraphQL 오류가 있으면 예외를 발생시킵니다."""
+        data = self.post([operation])[0]
+        if data.get("errors"):
+            raise Exception(f"GraphQL API 오류: {data['errors']}")
+        return data
+
+    def _run_chunk(self, operations, indices):
+        """묶음 하나를 보내고 (성공 {인덱스: 응답}, 실패 인덱스 목록, 오류 문자열, 요청 전체 실패 여부)를 돌려줍니다."""
+        payloads = [operations[i] for i in indices]
+        try:
+            responses = self.post(payloads)
+        except AuthError:
+            raise
+        except Exception as e:
+            error_str = str(e)
+            if "RATE_LIMIT" in error_str:
+                self.batch_sizer.record_rate_limit()
+            return {}, list(indices), error_str, True
+
+        succeeded, failed, errors = {}, [], []
+        for index, res in zip(indices, responses):
+            if res and not res.get("errors"):
+                succeeded[index] = res
+            else:
+                failed.append(index)
+                errors.append(str(res.get("errors")) if res else "빈 응답")
+        error_str = " / ".join(errors)
+        if "RATE_LIMIT" in error_str:
+            self.batch_sizer.record_rate_limit()
+        else:
+            self.batch_sizer.record_success(len(indices), self._local.latency)
+        return succeeded, failed, error_str, False
+
+    def execute_batched(self, operations, max_workers=1, on_success=None):
+        """작업들을 적응형 크기의 묶음으로 나눠 보내고, 실패한 작업만 골라 재시도합니다.
+
+        반환값은 operations와 같은 순서의 응답 목록이며, 끝내 실패한 작업 자리는 None입니다.
+        캐시가 있으면 유효한 응답이 저장된 작업은 요청하지 않습니다.
+        on_success를 넘기면 묶음이 성공할 때마다 {인덱스: 응답}으로 호출하므로, 도중에 중단되어도
+        그때까지 받은 결과를 저장해 둘 수 있습니다.
+        max_workers가 1보다 크면 그만큼의 묶음 요청을 동시에 진행합니다.
+        요청 전체가 실패하면(RATE_LIMIT 제외) 묶음을 반으로 나눠 재시도하므로, 문제가 되는 작업 하나 때문에
+        같은 묶음의 다른 작업까지 계속 실패하지 않습니다. 나누는 동안의 실패는 재시도 횟수에 넣지 않고,
+        혼자 남은 작업이 실패하거나 작업별 GraphQL 오류가 났을 때만 셉니다.
+        """
+        results = [None] * len(operations)
+        attempts = [0] * len(operations)
+        if self.cache is not None:
+            for index, operation in enumerate(operations):
+                results[index] = self.cache.get_response(operation)
+        pending = deque(index for index, res in enumerate(results) if res is None)
+        split_groups = deque() # 요청 전체가 실패해 나눈 묶음 (그대로 다시 보냅니다)
+        running = {}
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            while pending or split_groups or running:
+                while (pending or split_groups) and len(running) < max_workers:
+                    if split_groups:
+                        indices = split_groups.popleft()
+                        print(f"  - {len(indices)}개 작업 나눠서 요청...")
+                    else:
+                        size = self.batch_sizer.size
+                        indices = [pending.popleft() for _ in range(min(size, len(pending)))]
+                        print(f"  - {len(indices)}개 작업 일괄 요청 (묶음 크기 {size})...")
+                    running[executor.submit(self._run_chunk, operations, indices)] = indices
+
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    running.pop(future)
+                    succeeded, failed, error_str, request_failed = future.result()
+                    for index, res in succeeded.items():
+                        results[index] = res
+                    if self.cache is not None:
+                        self.cache.put_responses((operations[index], res) for index, res in succeeded.items())
+                    if on_success is not None and succeeded:
+                        on_success(succeeded)
+
+                    splitting = request_failed and "RATE_LIMIT" not in error_str and len(failed) > 1
+                    retryable = []
+                    for index in failed:
+                        # 묶음을 나눠 다시 보내는 경우는 재시도 횟수에 넣지 않습니다. 문제가 되는 작업과 같은 쪽에
+                        # 계속 들어가는 정상 작업이 나누는 도중에 재시도 한도를 다 써 버리지 않게 하기 위해서입니다.
+                        if not splitting:
+                            attempts[index] += 1
+                        if attempts[index] < self.max_retries:
+                            retryable.append(index)
+                    if len(retryable) < len(failed):
+                        print(f"    - 최대 재시도 후에도 {len(failed) - len(retryable)}개 작업 처리 실패. 건너뜁니다.")
+                    if retryable:
+                        delay = parse_retry_delay(error_str, self.retry_delay)
+                        if delay != self.retry_delay:
+                            print(f"    - 서버가 요청한 대기 시간({delay-1}초)을 준수합니다.")
+                        print(f"    - {delay}초 후 실패한 {len(retryable)}개 작업에 대해 재시도합니다... (오류: {error_str[:200]})")
+                        self.retry_count += len(retryable)
+                        METRICS.record_retry(len(retryable), delay)
+                        self.rate_limiter.pause(delay)
+                        if self.shared_limiter is not None and "RATE_LIMIT" in error_str:
+                            # 서버 한도에 걸렸다면 같은 한도를 쓰는 다른 스크립트도 함께 기다리게 합니다.
+                            self.shared_limiter.pause(delay)
+                        if splitting:
+                            half = (len(retryable) + 1) // 2
+                            split_groups.extend([retryable[:half], retryable[half:]])
+                            print(f"    - 요청 전체가 실패해 {len(retryable)}개 작업을 {half}개, {len(retryable) - half}개로 나눠 재시도합니다.")
+                        elif request_failed and "RATE_LIMIT" not in error_str:
+                            # 혼자서도 요청 전체를 실패시킨 작업은 다른 묶음에 섞지 않습니다.
+                            split_groups.append(retryable)
+                        else:
+                            pending.extend(retryable)
+
+        return results
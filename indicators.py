@@ -0,0 +1,122 @@
+# indicators.py (저장된 가격 이력으로 아이템별 지표를 이어서 계산하는 엔진: SQLite)
+
+import math
+
+# --- 상수 정의 ---
+EMA_SHORT_DAYS = 7       # 단기 지수 이동 평균 기간 (일)
+EMA_LONG_DAYS = 28       # 장기 지수 이동 평균 기간 (일)
+VOLATILITY_DAYS = 14     # 일별 가격 변화율 변동성과 가격 분산(z-score 기준)의 기간 (일)
+LIQUIDITY_DAYS = 7       # 일별 거래 수량 평균 기간 (일)
+STATE_FIELDS = ("last_date", "last_price", "days", "ema_short", "ema_long", "price_mean", "price_var", "return_var", "liquidity")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS indicator_state (
+    item_id TEXT PRIMARY KEY,
+    last_date TEXT NOT NULL,
+    last_price REAL,
+    days INTEGER NOT NULL,
+    ema_short REAL,
+    ema_long REAL,
+    price_mean REAL,
+    price_var REAL,
+    return_var REAL,
+    liquidity REAL
+) WITHOUT ROWID;
+"""
+
+def _alpha(days):
+    return 2.0 / (days + 1)
+
+
+def advance(state, average_price, items_count):
+    """하루치 이력 한 줄로 지표 상태를 O(1)에 갱신합니다. 가격이 없는 날은 거래 수량만 반영합니다."""
+    state["days"] += 1
+    a = _alpha(LIQUIDITY_DAYS)
+    count = items_count or 0
+    state["liquidity"] = count if state["liquidity"] is None else state["liquidity"] + a * (count - state["liquidity"])
+    if average_price is None or average_price <= 0:
+        return state
+
+    price = float(average_price)
+    if state["ema_short"] is None:
+        state.update(ema_short=price, ema_long=price, price_mean=price, price_var=0.0, return_var=0.0)
+    else:
+        state["ema_short"] += _alpha(EMA_SHORT_DAYS) * (price - state["ema_short"])
+        state["ema_long"] += _alpha(EMA_LONG_DAYS) * (price - state["ema_long"])
+        # 지수 가중 평균/분산 (이전 값과 새 값만으로 갱신)
+        a = _alpha(VOLATILITY_DAYS)
+        diff = price - state["price_mean"]
+        state["price_mean"] += a * diff
+        state["price_var"] = (1 - a) * (state["price_var"] + a * diff * diff)
+        if state["last_price"]:
+            change = price / state["last_price"] - 1
+            state["return_var"] = (1 - a) * state["return_var"] + a * change * change
+    state["last_price"] = price
+    return state
+
+def summarize(state, current_sell=None):
+    """지표 상태를 보고서용 값으로 바꿉니다. current_sell을 넘기면 가격 분포 대비 z-score를 함께 계산합니다."""
+    if state is None or state["ema_short"] is None:
+        return {"ema_short": None, "ema_long": None, "volatility(%)": None, "zScore": None,
+                "liquidity": round(state["liquidity"], 2) if state and state["liquidity"] is not None else None}
+    price_std = math.sqrt(state["price_var"])
+    z_score = (current_sell - state["price_mean"]) / price_std if current_sell is not None and price_std > 0 else None
+    return {
+        "ema_short": round(state["ema_short"], 2),
+        "ema_long": round(state["ema_long"], 2),
+        "volatility(%)": round(math.sqrt(state["return_var"]) * 100, 2),
+        "zScore": round(z_score, 2) if z_score is not None else None,
+        "liquidity": round(state["liquidity"], 2)
+    }
+
+
+class IndicatorEngine:
+    """price_history.db 안에 아이템별 지표 상태를 두고, 마지막으로 반영한 날짜 이후의 이력만 이어서 반영합니다.
+
+    지수 이동 평균(EMA), 지수 가중 가격 분산과 변화율 변동성, 거래 수량 평균은 모두 이전 상태와
+    새 이력 한 줄만으로 갱신되므로, 실행할 때마다 전체 이력을 다시 읽지 않습니다.
+    이미 반영한 날짜의 값이 나중에 덮어써져도 다시 반영하지 않습니다.
+    """
+
+    def __init__(self, store):
+        self.conn = store.conn
+        self.conn.executescript(_SCHEMA)
+
+    def _load(self, item_id):
+        row = self.conn.execute(f"SELECT {', '.join(STATE_FIELDS)} FROM indicator_state WHERE item_id = ?", (item_id,)).fetchone()
+        return dict(zip(STATE_FIELDS, row)) if row else None
+
+    def update(self, item_ids):
+        """아이템마다 아직 반영하지 않은 날짜의 이력을 반영하고, 반영한 이력 줄 수를 돌려줍니다."""
+        applied = 0
+        with self.conn:
+            for item_id in dict.fromkeys(item_ids):
+                state = self._load(item_id)
+                last_date = state["last_date"] if state else ""
+                rows = self.conn.execute(
+                    "SELECT date, average_price, items_count FROM price_history WHERE item_id = ? AND date > ? ORDER BY date",
+                    (item_id, last_date)
+                ).fetchall()
+                if not rows:
+                    continue
+                if state is None:
+                    state = dict.fromkeys(STATE_FIELDS)
+                    state["days"] = 0
+                for date, average_price, items_count in rows:
+                    advance(state, average_price, items_count)
+                state["last_date"] = rows[-1][0]
+                self.conn.execute(
+                    f"INSERT OR REPLACE INTO indicator_state VALUES (?, {', '.join('?' * len(STATE_FIELDS))})",
+                    (item_id, *(state[field] for field in STATE_FIELDS))
+                )
+                applied += len(rows)
+        return applied
+
+    def get_many(self, item_ids):
+        """{itemId: 지표 상태}를 돌려줍니다. 반영한 이력이 없는 아이템은 빠집니다."""
+        states = {}
+        for item_id in dict.fromkeys(item_ids):
+            state = self._load(item_id)
+            if state is not None:
+                states[item_id] = state
+        return states
@@ -0,0 +1,117 @@
+# item_index.py (수동 거래 내역의 아이템 이름 -> itemId 조회 색인)
+#
+# 사용법: python item_index.py
+#   -> results.json, transactions.json으로 item_index.json을 새로 만듭니다.
+
+import json
+import os
+import re
+import unicodedata
+
+from ndjson_store import is_ndjson_path, iter_records
+
+# --- 상수 정의 ---
+INDEX_FILE = 'item_index.json'
+SOURCE_FILES = ('results.json', 'transactions.json') # .ndjson 저장소도 사용할 수 있습니다
+SEASON_TAG = re.compile(r'^Y\d+S\d+$')
+
+# API의 영문 type/rarity 값을 거래 내역 화면(ko-KR)에 표시되는 이름으로 바꿉니다.
+TYPE_LABELS = {
+    "WeaponSkin": "무기 스킨",
+    "CharacterHeadgear": "머리보호구",
+    "CharacterUniform": "전투복",
+    "Charm": "부적",
+    "OperatorCardPortrait": "대원 초상화",
+    "WeaponAttachmentSkinSet": "부속품 스킨"
+}
+RARITY_LABELS = {
+    "rarity_common": "일반",
+    "rarity_uncommon": "고급",
+    "rarity_rare": "희소",
+    "rarity_superrare": "에픽",
+    "rarity_legendary": "전설"
+}
+
+
+def normalize_name(name):
+    """전각/반각, 공백, 대소문자 차이를 없앤 비교용 이름을 만듭니다."""
+    return " ".join(unicodedata.normalize("NFKC", name or "").split()).casefold()
+
+def make_key(name, type_label, rarity_label, season):
+    return "|".join((normalize_name(name), (type_label or "").strip(), (rarity_label or "").strip(), (season or "").strip()))
+
+def _item_keys(item):
+    """API 아이템 정보(name, type, tags)로 만들 수 있는 색인 키를 모두 돌려줍니다."""
+    tags = item.get("tags") or []
+    type_label = TYPE_LABELS.get(item.get("type"), item.get("type"))
+    rarities = [RARITY_LABELS[tag] for tag in tags if tag in RARITY_LABELS] or [""]
+    seasons = [tag for tag in tags if SEASON_TAG.match(tag)] or [""]
+    return [make_key(item.get("name"), type_label, rarity, season) for rarity in rarities for season in seasons]
+
+def _iter_source_items(file_path):
+    """results.json의 레코드와 transactions.json의 거래 아이템을 (itemId, name, type, tags) 형태로 돌려줍니다."""
+    if is_ndjson_path(file_path):
+        records = iter_records(file_path)
+    else:
+        with open(file_path, 'r', encoding='utf-8') as f:
+            records = json.load(f)
+    for record in records:
+        if record.get("itemId"):
+            yield record
+        for trade_item in record.get("tradeItems") or []:
+            item = (trade_item or {}).get("item") or {}
+            if item.get("itemId"):
+                yield item
+
+
+class ItemIndex:
+    """(이름, 종류, 등급, 시즌) -> itemId 색인. 한 키에 여러 itemId가 있으면 추측하지 않고 모호하다고 알립니다."""
+
+    def __init__(self, entries=None, sources=None):
+        self.entries = entries or {} # 키 -> itemId 목록
+        self.sources = sources or {} # 색인을 만든 파일 -> 수정 시각
+
+    @classmethod
+    def build(cls, source_files=SOURCE_FILES):
+        entries, sources = {}, {}
+        for file_path in source_files:
+            if not os.path.exists(file_path):
+                continue
+            sources[file_path] = os.path.getmtime(file_path)
+            for item in _iter_source_items(file_path):
+                for key in _item_keys(item):
+                    item_ids = entries.setdefault(key, [])
+                    if item["itemId"] not in item_ids:
+                        item_ids.append(item["itemId"])
+        return cls(entries, sources)
+
+    @classmethod
+    def load(cls, index_file=INDEX_FILE, source_files=SOURCE_FILES):
+        """저장된 색인을 읽습니다. 원본 파일이 바뀌었거나 색인이 없으면 새로 만들어 저장합니다."""
+        current_sources = {path: os.path.getmtime(path) for path in source_files if os.path.exists(path)}
+        try:
+            with open(index_file, 'r', encoding='utf-8') as f:
+                saved = json.load(f)
+            if saved.get("sources") == current_sources:
+                return cls(saved.get("entries"), saved.get("sources"))
+        except (FileNotFoundError, json.JSONDecodeError):
+            pass
+        index = cls.build(source_files)
+        index.save(index_file)
+        print(f"아이템 색인을 새로 만들었습니다. (키 {len(index.entries)}개 -> '{index_file}')")
+        return index
+
+    def save(self, index_file=INDEX_FILE):
+        with open(index_file, 'w', encoding='utf-8') as f:
+            json.dump({"sources": self.sources, "entries": self.entries}, f, ensure_ascii=False)
+
+    def lookup(self, name, type_label, rarity_label, season):
+        """일치하는 itemId 목록을 돌려줍니다. 비어 있으면 미확인, 둘 이상이면 모호한 경우입니다."""
+        return self.entries.get(make_key(name, type_label, rarity_label, season), [])
+
+
+if __name__ == "__main__":
+    index = ItemIndex.build()
+    index.save()
+    ambiguous = sum(1 for item_ids in index.entries.values() if len(item_ids) > 1)
+    print(f"성공: 키 {len(index.entries)}개(모호한 키 {ambiguous}개)의 색인을 '{INDEX_FILE}'에 저장했습니다.")
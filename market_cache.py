@@ -0,0 +1,140 @@
+# market_cache.py (스크립트 간에 공유하는 시장 데이터 캐시: TTL + LRU)
+
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+
+# --- 상수 정의 ---
+CACHE_DB_FILE = 'market_cache.db'
+MAX_CACHE_ENTRIES = 5000
+
+# 쿼리 종류별 유효 시간 (초). 여기에 없는 쿼리는 캐시하지 않습니다.
+CACHE_TTL = {
+    "GetItemDetails": 5 * 60,          # 판매/구매 현황은 금방 바뀌므로 짧게
+    "ItemMetadata": 7 * 24 * 60 * 60,  # 이름, 종류, 태그, 이미지 주소는 거의 바뀌지 않으므로 길게
+}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS cache (
+    kind TEXT NOT NULL,
+    key TEXT NOT NULL,
+    value TEXT NOT NULL,
+    stored_at REAL NOT NULL,
+    accessed_at REAL NOT NULL,
+    PRIMARY KEY (kind, key)
+);
+CREATE INDEX IF NOT EXISTS cache_accessed_at ON cache (accessed_at);
+"""
+
+
+def operation_cache_key(operation):
+    """같은 쿼리와 같은 variables라면 같은 키가 되도록 만듭니다.
+
+    원래 템플릿과 축소 변형(graphql/slim/)은 operationName이 같으므로, 쿼리 본문의 해시를 키에 넣어
+    필드가 다른 응답끼리 섞이지 않게 합니다.
+    """
+    query_hash = hashlib.sha1(operation.get("query", "").encode('utf-8')).hexdigest()[:16]
+    variables = json.dumps(operation.get("variables", {}), sort_keys=True, ensure_ascii=False)
+    return f"{query_hash}:{variables}"
+
+
+class MarketCache:
+    """모든 스크립트가 네트워크 요청 전에 확인하는 로컬 캐시.
+
+    쿼리 종류마다 유효 시간(TTL)이 다르며, 항목 수가 max_entries를 넘으면
+    가장 오래 사용되지 않은 항목부터 지웁니다.
+    파이프라인 모드처럼 여러 스레드가 같은 client(와 캐시)를 쓰므로, 연결은 스레드 간에 공유하고 잠금으로 보호합니다.
+    """
+
+    def __init__(self, db_file=CACHE_DB_FILE, ttl=None, max_entries=MAX_CACHE_ENTRIES):
+        self.ttl = dict(CACHE_TTL if ttl is None else ttl)
+        self.max_entries = max_entries
+        self.hits = {}
+        self.misses = {}
+        # 여러 스크립트가 동시에 같은 파일을 쓸 수 있으므로 잠금 대기 시간을 넉넉히 줍니다.
+        self.conn = sqlite3.connect(db_file, timeout=30, check_same_thread=False)
+        self.conn.executescript(_SCHEMA)
+        self._lock = threading.Lock()
+
+    def close(self):
+        self.conn.close()
+
+    def is_cacheable(self, kind):
+        return kind in self.ttl
+
+    def get(self, kind, key):
+        """유효한 값이 있으면 돌려주고, 없거나 만료되었으면 None을 돌려줍니다."""
+        now = time.time()
+        with self._lock:
+            row = self.conn.execute("SELECT value, stored_at FROM cache WHERE kind = ? AND key = ?", (kind, key)).fetchone()
+            if row is None or now - row[1] > self.ttl.get(kind, 0):
+                self.misses[kind] = self.misses.get(kind, 0) + 1
+                return None
+            with self.conn:
+                self.conn.execute("UPDATE cache SET accessed_at = ? WHERE kind = ? AND key = ?", (now, kind, key))
+            self.hits[kind] = self.hits.get(kind, 0) + 1
+        return json.loads(row[0])
+
+    def put_many(self, kind, entries):
+        """(키, 값) 목록을 저장하고, 크기 제한을 넘으면 오래 쓰지 않은 항목을 지웁니다."""
+        now = time.time()
+        rows = [(kind, key, json.dumps(value, ensure_ascii=False), now, now) for key, value in entries]
+        if not rows:
+            return
+        with self._lock, self.conn:
+            self.conn.executemany("INSERT OR REPLACE INTO cache VALUES (?, ?, ?, ?, ?)", rows)
+            excess = self.conn.execute("SELECT COUNT(*) FROM cache").fetchone()[0] - self.max_entries
+            if excess > 0:
+                self.conn.execute(
+                    "DELETE FROM cache WHERE rowid IN (SELECT rowid FROM cache ORDER BY accessed_at LIMIT ?)",
+                    (excess,)
+                )
+
+    def put(self, kind, key, value):
+        self.put_many(kind, [(key, value)])
+
+    def get_response(self, operation):
+        """캐시 대상 쿼리라면 저장된 응답을, 아니면 None을 돌려줍니다."""
+        kind = operation.get("operationName")
+        if not self.is_cacheable(kind):
+            return None
+        return self.get(kind, operation_cache_key(operation))
+
+    def put_responses(self, pairs):
+        """(작업, 응답) 목록 중 캐시 대상 쿼리의 응답을 저장합니다.
+
+        GetItemDetails 응답에 들어 있는 아이템 정보는 ItemMetadata로도 따로 저장합니다.
+        """
+        by_kind = {}
+        items = []
+        for operation, response in pairs:
+            kind = operation.get("operationName")
+            if not self.is_cacheable(kind):
+                continue
+            by_kind.setdefault(kind, []).append((operation_cache_key(operation), response))
+            if kind == "GetItemDetails":
+                marketable_item = ((response.get("data") or {}).get("game") or {}).get("marketableItem") or {}
+                items.append(marketable_item.get("item"))
+        for kind, entries in by_kind.items():
+            self.put_many(kind, entries)
+        if self.is_cacheable("ItemMetadata"):
+            self.put_item_metadata(items)
+
+    def get_item_metadata(self, item_id):
+        return self.get("ItemMetadata", item_id)
+
+    def put_item_metadata(self, items):
+        """itemId가 있는 아이템 정보(이름, 종류, 태그, 이미지 주소)를 캐시합니다."""
+        self.put_many("ItemMetadata", [(item["itemId"], item) for item in items if item and item.get("itemId")])
+
+    def report(self):
+        """실행이 끝날 때 쿼리 종류별 캐시 적중/실패 횟수를 출력합니다."""
+        kinds = sorted(set(self.hits) | set(self.misses))
+        if not kinds:
+            return
+        print("\n[캐시 통계]")
+        for kind in kinds:
+            hits, misses = self.hits.get(kind, 0), self.misses.get(kind, 0)
+            print(f"  - {kind}: 적중 {hits}회, 실패 {misses}회 (적중률 {hits / (hits + misses) * 100:.1f}%)")
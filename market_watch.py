@@ -0,0 +1,210 @@
+# market_watch.py (시장 감시 모드: 오래되고 변동성이 큰 아이템부터 계속 갱신)
+#
+# 사용법: python market_watch.py [--rpm 20] [--cycles 0]
+#   -> analyze_market.py와 같은 조건의 후보를 계속 감시하며 reports/market_watch_report.json을 주기적으로 갱신합니다.
+#      Ctrl+C로 종료하면 마지막 보고서를 저장합니다.
+
+import argparse
+import heapq
+import os
+import time
+
+import analyze_market as market
+from alerts import AlertEngine
+from graphql_client import GraphQLClient, build_headers, build_operation, operation_path
+from market_cache import MarketCache
+from metrics import METRICS
+from price_store import PriceHistoryStore, refresh_price_histories
+
+# --- 상수 정의 ---
+OUTPUT_FILE = os.path.join(market.REPORTS_DIR, 'market_watch_report.json')
+REQUESTS_PER_MINUTE = 20          # 감시 모드가 쓰는 고정 요청 한도 (분당)
+REFRESH_BATCH_SIZE = 10           # 한 번에 시세를 갱신할 아이템 수 (GetItemDetails 일괄 요청 하나)
+MIN_REFRESH_INTERVAL = 10 * 60    # 변동성이 가장 클 때의 갱신 간격 기준 (초)
+VOLATILITY_WEIGHT = 5.0           # 변동성(변동 계수)이 갱신 간격을 얼마나 줄일지
+VOLATILITY_DAYS = 14              # 변동성을 계산할 최근 가격 이력 기간 (일)
+LISTING_RESCAN_INTERVAL = 6 * 60 * 60 # 새 후보를 찾기 위해 시장 목록을 다시 훑는 주기 (초)
+REPORT_INTERVAL = 5 * 60          # 보고서를 다시 쓰는 주기 (초)
+
+
+def price_volatility(series, days=VOLATILITY_DAYS):
+    """최근 일별 평균가의 변동 계수(표준편차/평균)를 돌려줍니다. 이력이 부족하면 0입니다."""
+    prices = series.average[:days]
+    prices = prices[prices > 0]
+    if len(prices) < 2:
+        return 0.0
+    mean = float(prices.mean())
+    return float(prices.std()) / mean if mean > 0 else 0.0
+
+def refresh_interval(volatility):
+    """변동성이 클수록 짧은 갱신 간격을 돌려줍니다 (변동성 0이면 기준 간격의 1+VOLATILITY_WEIGHT배)."""
+    return MIN_REFRESH_INTERVAL * (1 + VOLATILITY_WEIGHT) / (1 + VOLATILITY_WEIGHT * min(volatility, 1.0))
+
+
+class RefreshQueue:
+    """다음 갱신 예정 시각이 빠른 아이템부터 꺼내는 우선순위 큐.
+
+    예정 시각은 마지막 갱신 시각 + 변동성에 따른 갱신 간격이므로, 오래되었고 변동성이 큰 아이템이 먼저 나옵니다.
+    아이템을 다시 넣으면 이전 항목은 꺼낼 때 버립니다.
+    """
+
+    def __init__(self):
+        self._heap = []
+        self._due = {}
+
+    def __len__(self):
+        return len(self._due)
+
+    def __contains__(self, item_id):
+        return item_id in self._due
+
+    def schedule(self, item_id, due_at):
+        self._due[item_id] = due_at
+        heapq.heappush(self._heap, (due_at, item_id))
+
+    def next_due(self):
+        while self._heap and self._due.get(self._heap[0][1]) != self._heap[0][0]:
+            heapq.heappop(self._heap)
+        return self._heap[0][0] if self._heap else None
+
+    def pop_due(self, now, limit):
+        """예정 시각이 지난 아이템을 최대 limit개 꺼냅니다."""
+        item_ids = []
+        while len(item_ids) < limit and self.next_due() is not None and self.next_due() <= now:
+            _, item_id = heapq.heappop(self._heap)
+            del self._due[item_id]
+            item_ids.append(item_id)
+        return item_ids
+
+
+class MarketWatcher:
+    """후보 아이템의 시세와 가격 이력을 요청 한도 안에서 우선순위대로 계속 갱신합니다."""
+
+    def __init__(self, client, store, market_query, details_template, history_template, metadata_template, alerts=None):
+        self.client = client
+        self.store = store
+        self.market_query = market_query
+        self.details_template = details_template
+        self.history_template = history_template
+        self.metadata_template = metadata_template
+        self.alerts = alerts # alerts.AlertEngine (선택)
+        self.items = {}            # itemId -> 목록/상세 응답 형식의 후보 ({"item", "marketData"})
+        self.available_ids = set() # 가격 이력을 확보한 아이템
+        self.queue = RefreshQueue()
+        self.next_rescan = 0.0
+        self.next_report = time.time() + REPORT_INTERVAL
+
+    def rescan_listing(self):
+        """시장 목록을 훑어 새 후보를 바로 갱신 대상으로 넣고, 기존 후보의 시세를 목록 값으로 바꿉니다."""
+        with METRICS.span("watch_listing"):
+            now = time.time()
+            added = 0
+            on_page = self.alerts.check_listing if self.alerts else None
+            market_query = dict(self.market_query, variables=dict(self.market_query["variables"]))
+            for page_candidates in market.iter_market_candidates(self.client, market_query, on_page=on_page):
+                for item in page_candidates:
+                    item_id = item["item"]["itemId"]
+                    if item_id not in self.items:
+                        added += 1
+                        self.queue.schedule(item_id, now)
+                    self.items[item_id] = item
+        self.next_rescan = time.time() + LISTING_RESCAN_INTERVAL
+        print(f"  - 감시 대상 {len(self.items)}개 (새 후보 {added}개)")
+
+    def refresh(self, item_ids):
+        """아이템들의 현재 시세(GetItemDetails)와 오래된 가격 이력을 갱신하고 다음 갱신 시각을 정합니다."""
+        with METRICS.span("watch_refresh"):
+            operations = [build_operation(self.details_template, itemId=item_id) for item_id in item_ids]
+            responses = self.client.execute_batched(operations)
+            for item_id, res in zip(item_ids, responses):
+                marketable_item = ((res or {}).get("data") or {}).get("game", {}).get("marketableItem") or {}
+                if marketable_item.get("marketData"):
+                    self.items[item_id] = dict(self.items[item_id], marketData=marketable_item["marketData"])
+            if self.alerts:
+                self.alerts.check_listing([self.items[item_id] for item_id in item_ids])
+            snapshots = market.listing_snapshots([self.items[item_id] for item_id in item_ids]) if market.DELTA_REFRESH else None
+            self.available_ids |= refresh_price_histories(self.client, self.store, self.history_template, item_ids, snapshots)
+
+        now = time.time()
+        for item_id in item_ids:
+            volatility = price_volatility(self.store.get_series(item_id))
+            self.queue.schedule(item_id, now + refresh_interval(volatility))
+
+    def write_report(self, fetch_metadata=True):
+        """현재까지의 결과로 보고서를 씁니다. fetch_metadata=False이면 아이템 정보(이름 등)를 요청하지 않습니다."""
+        if fetch_metadata:
+            market.attach_item_metadata(self.client, self.metadata_template,
+                                        [item for item_id, item in self.items.items() if item_id in self.available_ids])
+        report = market.score_candidates(self.store, list(self.items.values()), self.available_ids)
+        market.save_json_file(report, OUTPUT_FILE)
+        if self.alerts:
+            self.alerts.check_results(report)
+        self.next_report = time.time() + REPORT_INTERVAL
+
+    def run(self, cycles=0):
+        """cycles가 0이면 종료할 때까지, 아니면 갱신을 cycles번 한 뒤 멈춥니다."""
+        done_cycles = 0
+        while not cycles or done_cycles < cycles:
+            if time.time() >= self.next_rescan:
+                self.rescan_listing()
+
+            item_ids = self.queue.pop_due(time.time(), REFRESH_BATCH_SIZE)
+            if item_ids:
+                print(f"\n[감시] {len(item_ids)}개 아이템 갱신 (대기 중 {len(self.queue)}개)")
+                self.refresh(item_ids)
+                done_cycles += 1
+            else:
+                # 갱신할 아이템이 없으면 가장 가까운 예정 시각까지 요청하지 않고 기다립니다.
+                wake_at = min(t for t in (self.queue.next_due(), self.next_rescan, self.next_report) if t is not None)
+                delay = max(0.0, wake_at - time.time())
+                METRICS.record_sleep(delay)
+                time.sleep(delay)
+
+            if time.time() >= self.next_report:
+                self.write_report()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="시장 감시 모드 (오래되고 변동성이 큰 아이템부터 갱신)")
+    parser.add_argument("--rpm", type=float, default=REQUESTS_PER_MINUTE, help="분당 최대 요청 수")
+    parser.add_argument("--cycles", type=int, default=0, help="갱신 횟수 (0이면 Ctrl+C까지 계속)")
+    args = parser.parse_args()
+
+    config = market.load_json_file(market.CONFIG_FILE)
+    market_query = market.load_json_file(operation_path(market.GRAPHQL_DIR, 'GetMarketableItems.json'))
+    details_template = market.load_json_file(os.path.join(market.GRAPHQL_DIR, 'GetItemDetails.json'))
+    history_template = market.load_json_file(operation_path(market.GRAPHQL_DIR, 'GetItemPriceHistory.json'))
+    metadata_template = market.load_json_file(os.path.join(market.GRAPHQL_DIR, 'GetItemMetadata.json'))
+    if not all([config, market_query, details_template, history_template, metadata_template]): return
+
+    cache = MarketCache()
+    client = GraphQLClient(build_headers(config, market.APP_ID), requests_per_second=args.rpm / 60, batch_size=REFRESH_BATCH_SIZE, cache=cache)
+    store = PriceHistoryStore()
+    alerts = AlertEngine.load()
+    watcher = MarketWatcher(client, store, market_query, details_template, history_template, metadata_template, alerts)
+    print(f"시장 감시를 시작합니다. (분당 최대 {args.rpm:g}회 요청, 종료: Ctrl+C)")
+    failed = False
+    try:
+        watcher.run(args.cycles)
+    except KeyboardInterrupt:
+        print("\n감시를 종료합니다.")
+    except Exception as e:
+        failed = True
+        print(f"\n치명적인 오류 발생: {e}")
+    finally:
+        # 오류로 멈춘 경우에는 네트워크 요청 없이 보고서만 쓰고, 보고서 저장이 실패해도 아래 정리는 항상 진행합니다.
+        if watcher.items:
+            try:
+                watcher.write_report(fetch_metadata=not failed)
+            except Exception as e:
+                print(f"  - 경고: 마지막 보고서를 저장하지 못했습니다. (오류: {e})")
+        if alerts:
+            alerts.close()
+        store.close()
+        cache.report()
+        cache.close()
+        METRICS.write("market_watch")
+
+
+if __name__ == "__main__":
+    main()
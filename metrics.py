@@ -0,0 +1,181 @@
+# metrics.py (단계별 소요 시간과 요청 지표 기록)
+#
+# 세 스크립트가 함께 쓰는 기록기입니다. 실행이 끝나면 reports/metrics/<스크립트>.json에 저장하고,
+# METRICS_TEXTFILE_DIR 환경 변수에 폴더를 지정하면 Prometheus(node_exporter textfile collector)용
+# <폴더>/ubi_market_<스크립트>.prom 파일도 함께 씁니다.
+
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+# --- 상수 정의 ---
+METRICS_DIR = os.path.join('reports', 'metrics')
+TEXTFILE_DIR_ENV = 'METRICS_TEXTFILE_DIR'
+METRIC_PREFIX = 'ubi_market'
+LATENCY_BUCKETS = (0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0) # 요청 응답 시간 구간 (초)
+
+
+class Histogram:
+    """Prometheus 방식의 누적 구간 히스토그램."""
+
+    def __init__(self, buckets):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * len(self.buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.count += 1
+        self.sum += value
+        for i, upper in enumerate(self.buckets):
+            if value <= upper:
+                self.counts[i] += 1
+
+    def to_dict(self):
+        return {
+            "buckets": {str(upper): count for upper, count in zip(self.buckets, self.counts)},
+            "count": self.count,
+            "sum": round(self.sum, 4)
+        }
+
+
+class RunMetrics:
+    """한 번의 실행 동안 단계(span), 요청, 재시도, 대기 시간을 모읍니다. 여러 스레드에서 호출해도 안전합니다."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.started_at = time.time()
+        self._started = time.monotonic()
+        self.spans = []
+        self.latency = Histogram(LATENCY_BUCKETS)
+        self.counters = {
+            "requests": 0,
+            "requestErrors": 0,
+            "operations": 0,
+            "bytesSent": 0,
+            "bytesReceived": 0,
+            "retries": 0,
+            "backoffSeconds": 0.0,
+            "sleepSeconds": 0.0
+        }
+
+    @contextmanager
+    def span(self, name):
+        """with 블록의 시작 시점(실행 시작 기준)과 소요 시간을 기록합니다. 단계가 겹쳐도 각각 기록됩니다."""
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            ended = time.monotonic()
+            with self._lock:
+                self.spans.append({
+                    "name": name,
+                    "start": round(started - self._started, 3),
+                    "duration": round(ended - started, 3)
+                })
+
+    def record_request(self, latency, bytes_sent, bytes_received, operations, failed=False):
+        with self._lock:
+            self.latency.observe(latency)
+            self.counters["requests"] += 1
+            self.counters["requestErrors"] += int(failed)
+            self.counters["operations"] += operations
+            self.counters["bytesSent"] += bytes_sent
+            self.counters["bytesReceived"] += bytes_received
+
+    def record_retry(self, operations, backoff):
+        """재시도할 작업 수와 그 전에 두기로 한 대기 시간(초)을 기록합니다."""
+        with self._lock:
+            self.counters["retries"] += operations
+            self.counters["backoffSeconds"] += backoff
+
+    def record_sleep(self, seconds):
+        """요청 속도 제한으로 잠든 시간. 작업자 스레드마다 따로 더하므로 동시 요청 시 실행 시간보다 클 수 있습니다."""
+        with self._lock:
+            self.counters["sleepSeconds"] += seconds
+
+    def stage_durations(self):
+        """같은 이름의 단계는 소요 시간을 합쳐 {단계: 초}로 돌려줍니다."""
+        durations = {}
+        for span in self.spans:
+            durations[span["name"]] = round(durations.get(span["name"], 0.0) + span["duration"], 3)
+        return durations
+
+    def snapshot(self, script):
+        with self._lock:
+            counters = dict(self.counters)
+            counters["backoffSeconds"] = round(counters["backoffSeconds"], 3)
+            counters["sleepSeconds"] = round(counters["sleepSeconds"], 3)
+            return {
+                "script": script,
+                "startedAt": datetime.fromtimestamp(self.started_at, timezone.utc).isoformat(),
+                "wallTime": round(time.monotonic() - self._started, 3),
+                "stages": self.stage_durations(),
+                "spans": list(self.spans),
+                "counters": counters,
+                "requestLatency": self.latency.to_dict()
+            }
+
+    def write(self, script, metrics_dir=METRICS_DIR, textfile_dir=None):
+        """지표를 JSON 파일로 저장하고, textfile_dir(또는 환경 변수)가 있으면 .prom 파일도 씁니다."""
+        snapshot = self.snapshot(script)
+        os.makedirs(metrics_dir, exist_ok=True)
+        json_path = os.path.join(metrics_dir, f"{script}.json")
+        with open(json_path, 'w', encoding='utf-8') as f:
+            json.dump(snapshot, f, ensure_ascii=False, indent=2)
+        print(f"\n[지표] 총 {snapshot['wallTime']:.1f}초, 요청 {snapshot['counters']['requests']}회, "
+              f"재시도 {snapshot['counters']['retries']}회, 대기 {snapshot['counters']['sleepSeconds']:.1f}초 -> '{json_path}'")
+
+        textfile_dir = textfile_dir or os.environ.get(TEXTFILE_DIR_ENV)
+        if textfile_dir:
+            os.makedirs(textfile_dir, exist_ok=True)
+            prom_path = os.path.join(textfile_dir, f"{METRIC_PREFIX}_{script}.prom")
+            # 수집기가 쓰다 만 파일을 읽지 않도록 임시 파일에 쓴 뒤 교체합니다.
+            with open(prom_path + '.tmp', 'w', encoding='utf-8') as f:
+                f.write(to_prometheus(snapshot))
+            os.replace(prom_path + '.tmp', prom_path)
+        return json_path
+
+
+def _escape_label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def to_prometheus(snapshot):
+    """snapshot()의 결과를 Prometheus 텍스트 형식으로 바꿉니다."""
+    script = f'script="{_escape_label(snapshot["script"])}"'
+    counters = snapshot["counters"]
+    lines = []
+
+    def metric(name, kind, help_text, samples):
+        full_name = f"{METRIC_PREFIX}_{name}"
+        lines.append(f"# HELP {full_name} {help_text}")
+        lines.append(f"# TYPE {full_name} {kind}")
+        for suffix, labels, value in samples:
+            lines.append(f"{full_name}{suffix}{{{labels}}} {value}")
+
+    metric("run_duration_seconds", "gauge", "Wall time of the last run.", [("", script, snapshot["wallTime"])])
+    metric("last_run_timestamp_seconds", "gauge", "Start time of the last run.",
+           [("", script, int(datetime.fromisoformat(snapshot["startedAt"]).timestamp()))])
+    metric("stage_duration_seconds", "gauge", "Time spent in each stage of the last run.",
+           [("", f'{script},stage="{_escape_label(stage)}"', duration) for stage, duration in snapshot["stages"].items()])
+    metric("requests_total", "counter", "HTTP requests sent to the GraphQL endpoint.", [("", script, counters["requests"])])
+    metric("request_errors_total", "counter", "HTTP requests that failed or returned an error status.", [("", script, counters["requestErrors"])])
+    metric("operations_total", "counter", "GraphQL operations sent (a request can batch several).", [("", script, counters["operations"])])
+    metric("payload_bytes_total", "counter", "Request and response body sizes.",
+           [("", f'{script},direction="sent"', counters["bytesSent"]), ("", f'{script},direction="received"', counters["bytesReceived"])])
+    metric("retries_total", "counter", "Operations scheduled for a retry.", [("", script, counters["retries"])])
+    metric("backoff_seconds_total", "counter", "Backoff requested before retries.", [("", script, counters["backoffSeconds"])])
+    metric("sleep_seconds_total", "counter", "Time spent sleeping in the rate limiter, summed over worker threads.", [("", script, counters["sleepSeconds"])])
+
+    histogram = snapshot["requestLatency"]
+    samples = [("_bucket", f'{script},le="{upper}"', count) for upper, count in histogram["buckets"].items()]
+    samples += [("_bucket", f'{script},le="+Inf"', histogram["count"]), ("_sum", script, histogram["sum"]), ("_count", script, histogram["count"])]
+    metric("request_duration_seconds", "histogram", "Latency of GraphQL HTTP requests.", samples)
+    return "\n".join(lines) + "\n"
+
+
+# 프로세스 전체가 함께 쓰는 기록기
+METRICS = RunMetrics()
@@ -0,0 +1,207 @@
+# mock_graphql_server.py (벤치마크용 로컬 모의 GraphQL 서버)
+#
+# 사용법: python mock_graphql_server.py [포트]
+#   -> results.json, transactions.json을 응답 자료로 쓰는 서버를 띄웁니다.
+#      UBI_GRAPHQL_URL=http://127.0.0.1:<포트>/ 로 스크립트를 실행하면 실제 서버 대신 이 서버를 사용합니다.
+
+import json
+import random
+import re
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from ndjson_store import load_records
+
+# --- 상수 정의 ---
+RESULTS_FIXTURE = 'results.json'
+TRANSACTIONS_FIXTURE = 'transactions.json'
+DEFAULT_PORT = 8765
+DEFAULT_LATENCY = 0.05 # 일괄 요청 하나에 더하는 응답 지연 (초)
+DEFAULT_ACTIVE_COUNT = 30
+
+
+# --- 응답 자료 변환 ---
+def _item_info(record):
+    return {key: record.get(key) for key in ("itemId", "name", "type", "tags", "assetUrl")}
+
+def _market_data(record):
+    sell, buy, last_sold = record.get("lowestSellOrder"), record.get("highestBuyOrder"), record.get("lastSoldPrice")
+    return {
+        "sellStats": [{"lowestPrice": sell, "activeCount": DEFAULT_ACTIVE_COUNT}] if sell else None,
+        "buyStats": [{"highestPrice": buy, "activeCount": DEFAULT_ACTIVE_COUNT}] if buy else None,
+        "lastSoldAt": [{"price": last_sold}] if last_sold else None
+    }
+
+def _select(value, fields):
+    """쿼리에 적힌 필드 이름만 남깁니다. 실제 서버처럼 축소된 쿼리에는 작은 응답을 돌려주기 위한 근사입니다."""
+    if isinstance(value, dict):
+        return {key: _select(v, fields) for key, v in value.items() if key in fields}
+    if isinstance(value, list):
+        return [_select(v, fields) for v in value]
+    return value
+
+
+class MockGraphQLServer:
+    """기록된 결과(results.json)와 거래 내역(transactions.json)으로 GraphQL 작업에 응답하는 서버.
+
+    latency만큼 응답을 늦추고, error_rate 비율의 일괄 요청에는 HTTP 503을,
+    rate_limit_rate 비율의 일괄 요청에는 'RATE_LIMIT ... try again in N' 오류를 돌려줍니다.
+    bad_item_ids의 아이템을 요청하는 작업이 하나라도 들어 있는 일괄 요청은 통째로 HTTP 400으로 실패시킵니다.
+    """
+
+    def __init__(self, port=DEFAULT_PORT, results_file=RESULTS_FIXTURE, transactions_file=TRANSACTIONS_FIXTURE,
+                 latency=DEFAULT_LATENCY, error_rate=0.0, rate_limit_rate=0.0, retry_after=1, seed=None, bad_item_ids=()):
+        self.items = {record["itemId"]: record for record in load_records(results_file) if record.get("itemId")}
+        self.trades = load_records(transactions_file)
+        self.latency = latency
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.retry_after = retry_after
+        self.bad_item_ids = set(bad_item_ids)
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._seen_operations = set()
+        self.reset_stats()
+
+        server = self
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                status, out = server.handle_batch(body)
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(out)))
+                self.end_headers()
+                self.wfile.write(out)
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+        self.url = f"http://127.0.0.1:{self.httpd.server_address[1]}/"
+        self._thread = None
+
+    def reset_stats(self):
+        with self._lock:
+            self._seen_operations.clear()
+            self.stats = {
+                "requests": 0,
+                "operations": 0,
+                "repeatedOperations": 0, # 같은 작업을 다시 받은 횟수 (= 클라이언트의 재시도)
+                "injectedErrors": 0,
+                "injectedRateLimits": 0,
+                "badRequests": 0,
+                "bytesIn": 0,
+                "bytesOut": 0
+            }
+
+    def snapshot_stats(self):
+        with self._lock:
+            return dict(self.stats)
+
+    def _record(self, body, operations):
+        with self._lock:
+            self.stats["requests"] += 1
+            self.stats["operations"] += len(operations)
+            self.stats["bytesIn"] += len(body)
+            for op in operations:
+                key = json.dumps(op, sort_keys=True)
+                if key in self._seen_operations:
+                    self.stats["repeatedOperations"] += 1
+                self._seen_operations.add(key)
+            if any((op.get("variables") or {}).get("itemId") in self.bad_item_ids for op in operations):
+                self.stats["badRequests"] += 1
+                return "bad_request"
+            roll = self._random.random()
+            if roll < self.error_rate:
+                self.stats["injectedErrors"] += 1
+                return "error"
+            if roll < self.error_rate + self.rate_limit_rate:
+                self.stats["injectedRateLimits"] += 1
+                return "rate_limit"
+            return None
+
+    def handle_batch(self, body):
+        """요청 본문 하나를 처리하고 (HTTP 상태 코드, 응답 본문)을 돌려줍니다."""
+        try:
+            payload = json.loads(body)
+        except json.JSONDecodeError:
+            return 400, b'{"errors": [{"message": "invalid json"}]}'
+        operations = payload if isinstance(payload, list) else [payload]
+        fault = self._record(body, operations)
+        if self.latency:
+            time.sleep(self.latency)
+
+        if fault == "bad_request":
+            out = json.dumps({"errors": [{"message": "Bad Request"}]}).encode()
+            status = 400
+        elif fault == "error":
+            out = json.dumps({"errors": [{"message": "Service Unavailable"}]}).encode()
+            status = 503
+        elif fault == "rate_limit":
+            error = {"errors": [{"message": f"RATE_LIMIT: Too many requests, try again in {self.retry_after} seconds"}]}
+            out = json.dumps([error for _ in operations]).encode()
+            status = 200
+        else:
+            out = json.dumps([self.answer(op) for op in operations], ensure_ascii=False).encode()
+            status = 200
+        with self._lock:
+            self.stats["bytesOut"] += len(out)
+        return status, out
+
+    def _item_record(self, item_id):
+        # 응답 자료에 없는 아이템은 첫 기록을 복사해 만들어 줍니다 (보유 자산 등).
+        record = self.items.get(item_id)
+        if record is None:
+            record = dict(next(iter(self.items.values())), itemId=item_id)
+        return record
+
+    def answer(self, operation):
+        """GraphQL 작업 하나에 대한 응답을 만듭니다. 쿼리에 없는 필드는 응답에서 뺍니다."""
+        response = self._answer(operation)
+        if "data" in response:
+            fields = set(re.findall(r'[A-Za-z_]\w*', operation.get("query") or ""))
+            response = {"data": _select(response["data"], fields)}
+        return response
+
+    def _answer(self, operation):
+        name = operation.get("operationName") or ""
+        variables = operation.get("variables") or {}
+        if name.startswith("GetTransactions"):
+            trades = self.trades if name == "GetTransactions" else [t for t in self.trades if t.get("state") != "Created"]
+            offset, limit = variables.get("offset", 0), variables.get("limit", 100)
+            trades_data = {"nodes": trades[offset:offset + limit], "totalCount": len(trades)}
+            return {"data": {"game": {"viewer": {"meta": {"trades": trades_data}}}}}
+        if name.startswith("GetMarketableItems"):
+            records = list(self.items.values())
+            offset, limit = variables.get("offset", 0), variables.get("limit", 50)
+            nodes = [{"item": _item_info(r), "marketData": _market_data(r)} for r in records[offset:offset + limit]]
+            return {"data": {"game": {"marketableItems": {"nodes": nodes, "totalCount": len(records)}}}}
+        if name.startswith("GetItemDetails") or name == "GetItemMetadata":
+            record = self._item_record(variables.get("itemId"))
+            return {"data": {"game": {"marketableItem": {"item": _item_info(record), "marketData": _market_data(record)}}}}
+        if name.startswith("GetItemPriceHistory"):
+            record = self._item_record(variables.get("itemId"))
+            return {"data": {"game": {"marketableItem": {"priceHistory": record.get("priceHistory") or []}}}}
+        return {"errors": [{"message": f"알 수 없는 작업: {name}"}]}
+
+    def start(self):
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+if __name__ == "__main__":
+    port = int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_PORT
+    server = MockGraphQLServer(port=port)
+    print(f"모의 GraphQL 서버가 {server.url} 에서 실행 중입니다. (종료: Ctrl+C)")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        server.stop()
@@ -0,0 +1,80 @@
+# ndjson_store.py (줄 단위 JSON(NDJSON) 저장소와 변환 도구)
+#
+# 사용법: python ndjson_store.py results.json transactions.json
+#   -> results.ndjson, transactions.ndjson 파일을 만듭니다.
+
+import json
+import os
+import sys
+
+NDJSON_EXTENSIONS = ('.ndjson', '.jsonl')
+
+
+def is_ndjson_path(file_path):
+    """확장자가 .ndjson 또는 .jsonl이면 줄 단위 저장소로 취급합니다."""
+    return file_path.endswith(NDJSON_EXTENSIONS)
+
+
+def iter_records(file_path):
+    """파일 전체를 메모리에 올리지 않고 레코드를 한 줄씩 돌려줍니다.
+
+    마지막 줄이 쓰다 만 상태(프로그램 중단 등)라면 경고 후 건너뜁니다.
+    """
+    with open(file_path, 'r', encoding='utf-8') as f:
+        for line_no, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                print(f"경고: '{file_path}' {line_no}번째 줄의 형식이 잘못되어 건너뜁니다.")
+
+
+def append_records(file_path, records):
+    """레코드를 파일 끝에 한 줄씩 덧붙이고, 덧붙인 개수를 돌려줍니다."""
+    count = 0
+    with open(file_path, 'a', encoding='utf-8') as f:
+        for record in records:
+            f.write(json.dumps(record, ensure_ascii=False) + '\n')
+            count += 1
+    return count
+
+
+def write_records(file_path, records):
+    """레코드로 파일을 새로 씁니다. 임시 파일에 쓴 뒤 교체하므로 중간에 실패해도 기존 파일은 남습니다."""
+    temp_path = file_path + '.tmp'
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        for record in records:
+            f.write(json.dumps(record, ensure_ascii=False) + '\n')
+    os.replace(temp_path, file_path)
+
+
+def load_records(file_path):
+    """확장자에 따라 NDJSON 또는 일반 JSON 배열 파일을 목록으로 읽습니다."""
+    if is_ndjson_path(file_path):
+        return list(iter_records(file_path))
+    with open(file_path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def convert_json_to_ndjson(src_path, dst_path=None):
+    """기존 JSON 배열 파일(results.json 등)을 NDJSON 파일로 변환하고 새 파일 경로를 돌려줍니다."""
+    dst_path = dst_path or os.path.splitext(src_path)[0] + '.ndjson'
+    with open(src_path, 'r', encoding='utf-8') as f:
+        records = json.load(f)
+    if not isinstance(records, list):
+        raise ValueError(f"'{src_path}' 파일은 JSON 배열이 아닙니다.")
+    write_records(dst_path, records)
+    print(f"성공: '{src_path}'의 레코드 {len(records)}개를 '{dst_path}'로 변환했습니다.")
+    return dst_path
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("사용법: python ndjson_store.py <변환할 JSON 파일> [...]")
+    for path in sys.argv[1:]:
+        try:
+            convert_json_to_ndjson(path)
+        except (OSError, ValueError, json.JSONDecodeError) as e:
+            print(f"오류: '{path}' 변환 실패. (오류: {e})")
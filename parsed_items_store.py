@@ -0,0 +1,108 @@
+# parsed_items_store.py (parser.py 결과를 덧붙여 쌓는 저장소와 중복 확인용 서명 색인: SQLite)
+
+import json
+import os
+import sqlite3
+
+from ndjson_store import append_records, iter_records
+
+# --- 상수 정의 ---
+STORE_FILE = 'items.ndjson'
+SIGNATURE_DB_FILE = 'items_signatures.db'
+# 이 값이 모두 같아야 같은 거래로 봅니다.
+SIGNATURE_FIELDS = ("name", "type", "rarity", "season", "transaction_type", "transaction_date", "price", "status")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS signatures (
+    signature TEXT PRIMARY KEY
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+
+def _signature(record, occurrence):
+    """거래 정보와 '붙여넣은 내용 안에서 몇 번째로 나온 같은 거래인지'로 서명을 만듭니다.
+
+    같은 날 같은 가격으로 두 번 거래하면 두 레코드의 정보가 완전히 같으므로, 순번으로 구분합니다.
+    같은 내역을 다시 붙여넣으면 순번도 같으므로 중복으로 걸러집니다.
+    """
+    return json.dumps([record.get(field) for field in SIGNATURE_FIELDS] + [occurrence], ensure_ascii=False)
+
+def _with_occurrences(records, counts=None):
+    counts = {} if counts is None else counts
+    for record in records:
+        base = tuple(record.get(field) for field in SIGNATURE_FIELDS)
+        counts[base] = counts.get(base, 0) + 1
+        yield _signature(record, counts[base]), record
+
+
+class ParsedItemStore:
+    """레코드는 NDJSON 파일 끝에만 덧붙이고, 서명은 SQLite에 두어 기존 내역을 읽지 않고 중복을 확인합니다."""
+
+    def __init__(self, store_file=STORE_FILE, db_file=SIGNATURE_DB_FILE):
+        self.store_file = store_file
+        self.conn = sqlite3.connect(db_file)
+        self.conn.executescript(_SCHEMA)
+        self._sync_index()
+
+    def close(self):
+        self.conn.close()
+
+    def _store_size(self):
+        return os.path.getsize(self.store_file) if os.path.exists(self.store_file) else 0
+
+    def _sync_index(self):
+        """저장소 파일 크기가 색인에 기록된 크기와 다르면(직접 수정 등) 색인을 다시 만듭니다."""
+        row = self.conn.execute("SELECT value FROM meta WHERE key = 'store_size'").fetchone()
+        size = self._store_size()
+        if row is not None and int(row[0]) == size:
+            return
+        with self.conn:
+            self.conn.execute("DELETE FROM signatures")
+            if size:
+                self.conn.executemany(
+                    "INSERT OR IGNORE INTO signatures VALUES (?)",
+                    ((signature,) for signature, _ in _with_occurrences(iter_records(self.store_file)))
+                )
+            self._set_store_size()
+        if size:
+            print(f"'{self.store_file}'의 중복 확인 색인을 다시 만들었습니다.")
+
+    def _set_store_size(self):
+        self.conn.execute(
+            "INSERT INTO meta VALUES ('store_size', ?) ON CONFLICT(key) DO UPDATE SET value=excluded.value",
+            (str(self._store_size()),)
+        )
+
+    def count(self):
+        return self.conn.execute("SELECT COUNT(*) FROM signatures").fetchone()[0]
+
+    def find_new(self, records, occurrences=None):
+        """저장소에 없는 레코드만 (서명, 레코드) 목록으로 돌려줍니다. 기존 내역의 크기와 무관하게 레코드당 색인 조회 한 번입니다.
+
+        붙여넣은 내용을 나눠서 확인할 때는 같은 occurrences 사전을 넘겨, 같은 거래의 순번을 이어서 세게 합니다.
+        """
+        new_entries = []
+        for signature, record in _with_occurrences(records, occurrences):
+            if self.conn.execute("SELECT 1 FROM signatures WHERE signature = ?", (signature,)).fetchone() is None:
+                new_entries.append((signature, record))
+        return new_entries
+
+    def append(self, new_entries):
+        """find_new의 결과를 저장소 끝에 덧붙이고 서명을 색인에 기록합니다."""
+        if not new_entries:
+            return 0
+        with self.conn:
+            self.conn.executemany("INSERT OR IGNORE INTO signatures VALUES (?)", ((signature,) for signature, _ in new_entries))
+            count = append_records(self.store_file, (record for _, record in new_entries))
+            self._set_store_size()
+        return count
+
+    def add(self, records):
+        """저장소에 없는 레코드만 덧붙이고, 덧붙인 레코드 목록을 돌려줍니다."""
+        new_entries = self.find_new(records)
+        self.append(new_entries)
+        return [record for _, record in new_entries]
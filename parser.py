@@ -1,121 +1,212 @@
 import json
+import os
 import re
+from itertools import islice
+
+from item_index import ItemIndex
+from parsed_items_store import ParsedItemStore
 
 INPUT_FILE = 'input.txt'
-OUTPUT_FILE = 'items.json'
+OUTPUT_FILE = 'items.ndjson' # 한 줄에 거래 하나씩 덧붙여 쌓습니다
+LEGACY_OUTPUT_FILE = 'items.json' # 이전 형식. OUTPUT_FILE이 비어 있으면 처음 한 번 옮겨 옵니다
+STATUS_VALUES = ('완료', '취소됨', '만료됨') # 거래 블록의 마지막 줄
+MAX_BLOCK_LINES = 30 # 상태 줄 없이 이보다 길어진 블록은 잘못된 블록으로 보고 버립니다
+PARSE_CHUNK_SIZE = 500 # 파싱한 레코드를 이 개수씩 중복 확인하고 저장합니다 (메모리에는 한 묶음만 둡니다)
+PRICE_LINE = re.compile(r'^\d[\d,]*$')
+DATE_PARTS = re.compile(r'\d+')
+
+
+class _Block:
+    """파싱 중인 거래 블록 하나. 줄이 들어올 때마다 거래 유형과 날짜를 바로 기록합니다."""
+
+    def __init__(self, start_line, first_line):
+        self.start_line = start_line
+        self.lines = [first_line]
+        self.transaction_type = ""
+        self.date_raw = None
+        self._expect_date = False
+
+    def add(self, line):
+        if self._expect_date:
+            self.date_raw = line
+            self._expect_date = False
+        elif "유효일" in line and self.date_raw is None:
+            self._expect_date = True
+        if not self.transaction_type and "주문" in line:
+            self.transaction_type = line
+        self.lines.append(line)
+
+
+def _skip_block(block, end_line, reason):
+    print(f"  - 경고: {block.start_line}~{end_line}번째 줄의 블록을 건너뜁니다. ({reason})")
+
+def _finish_block(block, end_line):
+    """완성된 블록을 거래 내역 레코드로 바꿉니다. 필요한 정보가 없으면 경고 후 None을 돌려줍니다."""
+    lines = block.lines
+    if len(lines) < 8:
+        _skip_block(block, end_line, "정보 부족")
+        return None
+    if not block.transaction_type or block.date_raw is None:
+        _skip_block(block, end_line, "거래 유형 또는 날짜를 찾지 못함")
+        return None
+
+    try:
+        # 가격에서 쉼표(,)를 제거한 후 숫자로 변환
+        price = int(lines[0].replace(',', ''))
+        date_parts = DATE_PARTS.findall(block.date_raw)
+        transaction_date = f"{date_parts[0]}-{int(date_parts[1]):02d}-{int(date_parts[2]):02d}"
+    except (ValueError, IndexError) as e:
+        _skip_block(block, end_line, f"오류: {e}")
+        return None
+
+    return {
+        "item_id": "", # 사용자가 직접 채워야 할 필드
+        "price": price,
+        "name": lines[1],
+        "type": lines[2],
+        "rarity": lines[3],
+        "season": lines[4],
+        "transaction_type": block.transaction_type,
+        "transaction_date": transaction_date,
+        "status": lines[-1] # 상태는 항상 마지막 줄에 있음
+    }
+
+def iter_trade_records(lines):
+    """붙여넣은 거래 내역을 한 줄씩 한 번만 훑으며 레코드를 하나씩 돌려줍니다.
+
+    '숫자'로 시작하는 줄에서 블록을 열고, '완료', '취소됨', '만료됨' 중 하나인 줄에서 닫습니다.
+    상태 줄 없이 다음 거래(날짜 뒤의 가격 줄)가 시작되거나 블록이 MAX_BLOCK_LINES를 넘으면
+    해당 블록을 줄 번호와 함께 보고하고 건너뛰므로, 한 번에 한 블록만 메모리에 둡니다.
+    """
+    block = None
+    line_no = 0
+    for line_no, raw_line in enumerate(lines, 1):
+        line = raw_line.strip()
+        if not line:
+            continue
+        if block is None:
+            if line[0].isdigit():
+                block = _Block(line_no, line)
+            continue
+
+        if line in STATUS_VALUES:
+            block.add(line)
+            record = _finish_block(block, line_no)
+            block = None
+            if record is not None:
+                yield record
+        elif block.date_raw is not None and PRICE_LINE.match(line):
+            _skip_block(block, line_no - 1, "상태 줄 없이 다음 거래가 시작됨")
+            block = _Block(line_no, line)
+        elif len(block.lines) >= MAX_BLOCK_LINES:
+            _skip_block(block, line_no - 1, f"{MAX_BLOCK_LINES}줄 안에 상태 줄이 없음")
+            block = _Block(line_no, line) if line[0].isdigit() else None
+        else:
+            block.add(line)
+
+    if block is not None:
+        _skip_block(block, line_no, "상태 줄 없이 입력이 끝남")
+
+def fill_item_ids(items, index):
+    """item_id가 비어 있는 레코드를 색인으로 채우고 (채운 수, 미확인 수, 모호한 레코드 목록)을 돌려줍니다."""
+    resolved, unresolved, ambiguous = 0, 0, []
+    for item in items:
+        if item.get("item_id"):
+            continue
+        item_ids = index.lookup(item["name"], item["type"], item["rarity"], item["season"])
+        if len(item_ids) == 1:
+            item["item_id"] = item_ids[0]
+            resolved += 1
+        elif item_ids:
+            ambiguous.append((item, item_ids))
+        else:
+            unresolved += 1
+    return resolved, unresolved, ambiguous
+
+def group_ambiguous(ambiguous, groups):
+    """fill_item_ids의 모호한 레코드를 '아이템 설명 -> [레코드 수, 후보 itemId 수]'로 groups에 모읍니다."""
+    for item, item_ids in ambiguous:
+        label = f"'{item['name']}' ({item['type']}/{item['rarity']}/{item['season']})"
+        groups.setdefault(label, [0, len(item_ids)])[0] += 1
+    return groups
+
+def print_item_id_report(resolved, unresolved, ambiguous_groups):
+    """item_id 자동 입력 결과를 출력합니다."""
+    ambiguous_count = sum(record_count for record_count, _ in ambiguous_groups.values())
+    print(f"item_id 자동 입력: {resolved}개 완료, {unresolved}개 미확인, {ambiguous_count}개 모호")
+    for label, (record_count, candidate_count) in ambiguous_groups.items():
+        print(f"  - 모호: {label} {record_count}건, 같은 정보의 아이템이 {candidate_count}개 있어 자동으로 채우지 않았습니다.")
+
+def migrate_legacy_items(store, index):
+    """이전 형식의 items.json 내용을 새 저장소로 한 번 옮깁니다. 원본 파일은 그대로 둡니다."""
+    try:
+        with open(LEGACY_OUTPUT_FILE, 'r', encoding='utf-8') as f:
+            legacy_items = json.load(f)
+    except json.JSONDecodeError:
+        print(f"경고: '{LEGACY_OUTPUT_FILE}' 파일의 형식이 잘못되어 옮기지 않습니다.")
+        return
+    fill_item_ids(legacy_items, index)
+    added = store.add(legacy_items)
+    print(f"기존 '{LEGACY_OUTPUT_FILE}'의 거래 내역 {len(added)}개를 '{OUTPUT_FILE}'로 옮겼습니다.")
 
 def parse_raw_text_to_json():
     """
-    거래 내역 텍스트 파일을 읽어 items.json 형식으로 변환합니다.
+    거래 내역 텍스트 파일을 읽어 새 거래만 items.ndjson에 덧붙입니다.
     (숫자로 시작해서 상태 값으로 끝나는 패턴을 인식)
     """
-    try:
-        with open(INPUT_FILE, 'r', encoding='utf-8') as f:
-            raw_text = f.read()
-    except FileNotFoundError:
+    if not os.path.exists(INPUT_FILE):
         print(f"오류: '{INPUT_FILE}' 파일을 찾을 수 없습니다.")
         print("거래 내역을 복사한 'input.txt' 파일을 생성해주세요.")
         with open(INPUT_FILE, 'w', encoding='utf-8') as f:
             f.write("여기에 마켓플레이스 거래 내역을 붙여넣으세요.")
         return
 
-    # "숫자로 시작"해서 "상태(완료, 취소됨, 만료됨 등)로 끝나는" 블록을 찾음
-    # re.DOTALL은 개행 문자(\n)도 . 에 포함시켜 여러 줄을 한 번에 찾게 함
-    # re.MULTILINE은 각 줄의 시작(^)과 끝($)을 인식하게 함
-    pattern = re.compile(r'^\d[\d,]*.*?^(?:완료|취소됨|만료됨)$', re.DOTALL | re.MULTILINE)
-    blocks = pattern.findall(raw_text)
-    
-    if not blocks:
-        print("오류: 텍스트에서 유효한 거래 내역 패턴을 찾지 못했습니다.")
-        print("데이터가 '숫자'로 시작해서 '완료', '취소됨', '만료됨' 중 하나로 끝나는지 확인해주세요.")
-        return
-        
-    parsed_items = []
-    print(f"총 {len(blocks)}개의 거래 내역을 발견했습니다. 파싱을 시작합니다...")
-
-    for i, block in enumerate(blocks):
-        # 블록 내의 빈 줄들을 제거하고 라인별로 나눔
-        lines = [line.strip() for line in block.split('\n') if line.strip()]
-        
-        if len(lines) < 8:
-            print(f"  - 경고: {i+1}번째 블록의 정보가 부족하여 건너뜁니다. 내용: {block}")
-            continue
+    store = ParsedItemStore(OUTPUT_FILE)
+    try:
+        index = ItemIndex.load()
+        if not store.count() and os.path.exists(LEGACY_OUTPUT_FILE):
+            migrate_legacy_items(store, index)
 
-        try:
-            # --- 이 부분이 수정되었습니다 ---
-            # 가격에서 쉼표(,)를 제거한 후 숫자로 변환
-            price = int(lines[0].replace(',', ''))
-            # ---------------------------
-
-            name = lines[1]
-            item_type = lines[2]
-            rarity = lines[3]
-            season = lines[4]
-            
-            # '유형', '유효일', '상태'를 직접 찾아서 더 안정적으로 추출
-            transaction_type = next((line for line in lines if "주문" in line), "")
-            transaction_status = lines[-1] # 상태는 항상 마지막 줄에 있음
-
-            date_line_index = -1
-            for idx, line in enumerate(lines):
-                if "유효일" in line:
-                    date_line_index = idx + 1
+        # 이번에 붙여넣은 내용만 읽고, 기존 내역은 서명 색인으로 중복을 확인합니다.
+        # 레코드는 PARSE_CHUNK_SIZE개씩 확인하고 바로 덧붙이므로, 붙여넣은 내용이 커도 한 묶음만 메모리에 둡니다.
+        print("거래 내역 파싱을 시작합니다...")
+        parsed_count = new_count = resolved = unresolved = 0
+        occurrences, ambiguous_groups = {}, {}
+        with open(INPUT_FILE, 'r', encoding='utf-8') as f:
+            records = iter_trade_records(f)
+            while True:
+                chunk = list(islice(records, PARSE_CHUNK_SIZE))
+                if not chunk:
                     break
-            
-            if not transaction_type or date_line_index == -1:
-                print(f"  - 경고: {i+1}번째 블록에서 거래 유형 또는 날짜를 찾지 못해 건너뜁니다.")
-                continue
-
-            transaction_date_raw = lines[date_line_index]
-            date_parts = re.findall(r'\d+', transaction_date_raw)
-            transaction_date = f"{date_parts[0]}-{int(date_parts[1]):02d}-{int(date_parts[2]):02d}"
-
-            item_data = {
-                "item_id": "", # 사용자가 직접 채워야 할 필드
-                "price": price,
-                "name": name,
-                "type": item_type,
-                "rarity": rarity,
-                "season": season,
-                "transaction_type": transaction_type,
-                "transaction_date": transaction_date,
-                "status": transaction_status # 상태 정보도 추가
-            }
-            parsed_items.append(item_data)
-            
-        except (ValueError, IndexError) as e:
-            print(f"  - 오류: {i+1}번째 블록을 파싱하는 중 문제가 발생했습니다. 건너뜁니다. (오류: {e}, 블록: {block})")
-            continue
-    
-    # 기존 items.json이 있다면 내용을 유지하고 새로운 내용만 추가
-    try:
-        with open(OUTPUT_FILE, 'r', encoding='utf-8') as f:
-            existing_items = json.load(f)
-        print(f"기존 '{OUTPUT_FILE}' 파일을 불러왔습니다. 새로운 내용을 추가합니다.")
-        
-        # 중복을 방지하기 위해 기존에 없는 아이템만 추가 (이름, 날짜, 가격으로 식별)
-        existing_signatures = { (item['name'], item['transaction_date'], item['price']) for item in existing_items }
-        new_items_to_add = [
-            item for item in parsed_items 
-            if (item['name'], item['transaction_date'], item['price']) not in existing_signatures
-        ]
-        
-        final_items = existing_items + new_items_to_add
-        print(f"{len(new_items_to_add)}개의 새로운 거래 내역이 추가되었습니다.")
-        
-    except (FileNotFoundError, json.JSONDecodeError):
-        # 파일이 없거나 비어있으면 새로 생성
-        final_items = parsed_items
-        print(f"기존 파일이 없어, 새로 파싱된 {len(final_items)}개의 내용으로 파일을 생성합니다.")
+                parsed_count += len(chunk)
+                new_entries = store.find_new(chunk, occurrences)
 
-    try:
-        with open(OUTPUT_FILE, 'w', encoding='utf-8') as f:
-            json.dump(final_items, f, ensure_ascii=False, indent=2)
-        print(f"\n파싱 완료! '{OUTPUT_FILE}' 파일이 업데이트되었습니다.")
-        print(f"이제 '{OUTPUT_FILE}' 파일을 열어 각 아이템의 'item_id' 값을 직접 채워주세요.")
-    except Exception as e:
-        print(f"오류: 결과를 파일로 저장하는 중 문제가 발생했습니다. (오류: {e})")
+                # results.json, transactions.json에 있는 아이템은 item_id를 자동으로 채웁니다.
+                chunk_resolved, chunk_unresolved, ambiguous = fill_item_ids([record for _, record in new_entries], index)
+                resolved += chunk_resolved
+                unresolved += chunk_unresolved
+                group_ambiguous(ambiguous, ambiguous_groups)
+
+                try:
+                    store.append(new_entries)
+                except Exception as e:
+                    print(f"오류: 결과를 파일로 저장하는 중 문제가 발생했습니다. (오류: {e})")
+                    print(f"  - 그 전까지 새 거래 {new_count}개는 '{OUTPUT_FILE}' 파일에 추가되었습니다.")
+                    return
+                new_count += len(new_entries)
+
+        if not parsed_count:
+            print("오류: 텍스트에서 유효한 거래 내역 패턴을 찾지 못했습니다.")
+            print("데이터가 '숫자'로 시작해서 '완료', '취소됨', '만료됨' 중 하나로 끝나는지 확인해주세요.")
+            return
+        print(f"총 {parsed_count}개의 거래 내역을 파싱했습니다. (새 거래 {new_count}개, 이미 저장된 거래 {parsed_count - new_count}개)")
+        print_item_id_report(resolved, unresolved, ambiguous_groups)
+        print(f"\n파싱 완료! {new_count}개의 새로운 거래 내역을 '{OUTPUT_FILE}' 파일에 추가했습니다.")
+        if unresolved or ambiguous_groups:
+            print(f"이제 '{OUTPUT_FILE}' 파일을 열어 비어 있는 'item_id' 값을 직접 채워주세요.")
+    finally:
+        store.close()
 
 
 if __name__ == "__main__":
-    parse_raw_text_to_json()
\ No newline at end of file
+    parse_raw_text_to_json()
@@ -0,0 +1,173 @@
+# position_ledger.py (보유 자산 매수 묶음(lot) 장부: SQLite)
+
+import sqlite3
+
+# --- 상수 정의 ---
+LEDGER_DB_FILE = 'positions.db'
+COST_BASIS_METHODS = ('fifo', 'average') # 선입선출 / 이동평균
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS lots (
+    lot_id INTEGER PRIMARY KEY,
+    item_id TEXT NOT NULL,
+    trade_id TEXT NOT NULL,
+    name TEXT,
+    asset_url TEXT,
+    unit_cost REAL NOT NULL,
+    quantity INTEGER NOT NULL,
+    remaining INTEGER NOT NULL,
+    acquired_at TEXT
+);
+CREATE INDEX IF NOT EXISTS lots_by_item ON lots (item_id, remaining);
+CREATE TABLE IF NOT EXISTS applied_trades (
+    trade_id TEXT PRIMARY KEY,
+    item_id TEXT,
+    category TEXT,
+    modified_at TEXT
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS realized (
+    trade_id TEXT PRIMARY KEY,
+    item_id TEXT NOT NULL,
+    quantity INTEGER NOT NULL,
+    sell_price REAL NOT NULL,
+    cost_basis REAL,
+    sold_at TEXT
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+# --- 도우미 함수 ---
+def _trade_item(trade):
+    return ((trade.get("tradeItems") or [{}])[0] or {}).get("item") or {}
+
+def _trade_quantity(trade):
+    # 마켓플레이스 거래는 아이템 하나씩 이루어지지만, 수량 필드가 생기면 그 값을 씁니다.
+    return ((trade.get("tradeItems") or [{}])[0] or {}).get("quantity") or 1
+
+
+class PositionLedger:
+    """성공한 거래를 한 번씩만 반영해 아이템별 매수 묶음(lot)과 실현 손익을 쌓아 두는 장부.
+
+    같은 아이템을 여러 번 사면 묶음이 따로 쌓이고, 판매하면 'fifo'는 가장 오래된 묶음부터,
+    'average'는 남은 묶음 전체의 평균 단가로 차감합니다.
+    """
+
+    def __init__(self, method='fifo', db_file=LEDGER_DB_FILE):
+        if method not in COST_BASIS_METHODS:
+            raise ValueError(f"지원하지 않는 원가 계산 방식입니다: {method} (선택: {', '.join(COST_BASIS_METHODS)})")
+        self.method = method
+        self.conn = sqlite3.connect(db_file)
+        self.conn.executescript(_SCHEMA)
+
+    def close(self):
+        self.conn.close()
+
+    def needs_rebuild(self):
+        """장부가 비었거나 다른 원가 계산 방식으로 만들어졌다면 전체 거래로 다시 만들어야 합니다."""
+        row = self.conn.execute("SELECT value FROM meta WHERE key = 'method'").fetchone()
+        applied = self.conn.execute("SELECT 1 FROM applied_trades LIMIT 1").fetchone()
+        return applied is None or row is None or row[0] != self.method
+
+    def rebuild(self, trades):
+        """장부를 비우고 전체 거래로 다시 만듭니다."""
+        with self.conn:
+            for table in ("lots", "applied_trades", "realized"):
+                self.conn.execute(f"DELETE FROM {table}")
+        return self.apply(trades)
+
+    def apply(self, trades):
+        """아직 반영하지 않은 성공 거래만 시간순으로 반영하고, 반영한 거래 수를 돌려줍니다."""
+        succeeded = sorted(
+            (t for t in trades if t.get("state") == "Succeeded" and t.get("id")),
+            key=lambda t: t.get("lastModifiedAt", "")
+        )
+        applied_count = 0
+        with self.conn:
+            for trade in succeeded:
+                if self.conn.execute("SELECT 1 FROM applied_trades WHERE trade_id = ?", (trade["id"],)).fetchone():
+                    continue
+                item = _trade_item(trade)
+                item_id = item.get("itemId")
+                price = (trade.get("payment") or {}).get("price")
+                if not item_id or price is None:
+                    continue
+
+                quantity = _trade_quantity(trade)
+                if trade.get("category") == "Buy":
+                    self.conn.execute(
+                        "INSERT INTO lots (item_id, trade_id, name, asset_url, unit_cost, quantity, remaining, acquired_at) "
+                        "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                        (item_id, trade["id"], item.get("name"), item.get("assetUrl"), price / quantity, quantity, quantity, trade.get("lastModifiedAt"))
+                    )
+                elif trade.get("category") == "Sell":
+                    cost_basis = self._consume(item_id, quantity)
+                    self.conn.execute(
+                        "INSERT INTO realized VALUES (?, ?, ?, ?, ?, ?)",
+                        (trade["id"], item_id, quantity, price, cost_basis, trade.get("lastModifiedAt"))
+                    )
+                else:
+                    continue
+
+                self.conn.execute(
+                    "INSERT INTO applied_trades VALUES (?, ?, ?, ?)",
+                    (trade["id"], item_id, trade.get("category"), trade.get("lastModifiedAt"))
+                )
+                applied_count += 1
+            self.conn.execute(
+                "INSERT INTO meta VALUES ('method', ?) ON CONFLICT(key) DO UPDATE SET value=excluded.value", (self.method,)
+            )
+        return applied_count
+
+    def _consume(self, item_id, quantity):
+        """판매 수량만큼 묶음을 차감하고 원가 합계를 돌려줍니다. 장부에 없는 아이템(이전에 산 것)이면 None입니다."""
+        open_lots = self.conn.execute(
+            "SELECT lot_id, unit_cost, remaining FROM lots WHERE item_id = ? AND remaining > 0 ORDER BY acquired_at, lot_id",
+            (item_id,)
+        ).fetchall()
+        if not open_lots:
+            return None
+
+        total_remaining = sum(remaining for _, _, remaining in open_lots)
+        average_cost = sum(cost * remaining for _, cost, remaining in open_lots) / total_remaining
+        cost_basis, left = 0.0, quantity
+        for lot_id, unit_cost, remaining in open_lots:
+            if left <= 0:
+                break
+            used = min(left, remaining)
+            cost_basis += used * (unit_cost if self.method == 'fifo' else average_cost)
+            left -= used
+            self.conn.execute("UPDATE lots SET remaining = remaining - ? WHERE lot_id = ?", (used, lot_id))
+        if self.method == 'average':
+            # 평균 방식에서는 남은 묶음이 모두 같은 평균 단가를 갖습니다.
+            self.conn.execute("UPDATE lots SET unit_cost = ? WHERE item_id = ? AND remaining > 0", (average_cost, item_id))
+        if left > 0:
+            print(f"  - 경고: '{item_id}' 판매 수량이 장부의 보유 수량보다 {left}개 많습니다.")
+        return cost_basis
+
+    def open_positions(self):
+        """남은 묶음이 있는 아이템을 {itemId: 보유 정보}로 돌려줍니다. myBuyPrice는 남은 묶음의 평균 단가입니다."""
+        positions = {}
+        for item_id, name, asset_url, unit_cost, remaining, acquired_at in self.conn.execute(
+            "SELECT item_id, name, asset_url, unit_cost, remaining, acquired_at FROM lots "
+            "WHERE remaining > 0 ORDER BY acquired_at, lot_id"
+        ):
+            position = positions.setdefault(item_id, {"name": name, "assetUrl": asset_url, "quantity": 0, "totalCost": 0.0, "lots": []})
+            position["quantity"] += remaining
+            position["totalCost"] += unit_cost * remaining
+            position["lots"].append({"unitCost": round(unit_cost, 2), "remaining": remaining, "acquiredAt": acquired_at})
+            position["buyDate"] = acquired_at # 가장 최근 매수일
+        for position in positions.values():
+            position["myBuyPrice"] = round(position["totalCost"] / position["quantity"], 2)
+            position["totalCost"] = round(position["totalCost"], 2)
+        return positions
+
+    def realized_summary(self, transaction_fee):
+        """장부에서 원가를 알 수 있는 판매의 (건수, 수수료 차감 후 실현 손익 합계)를 돌려줍니다."""
+        count, profit = self.conn.execute(
+            "SELECT COUNT(*), SUM(sell_price * (1 - ?) - cost_basis) FROM realized WHERE cost_basis IS NOT NULL",
+            (transaction_fee,)
+        ).fetchone()
+        return count, round(profit or 0.0, 2)
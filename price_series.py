@@ -0,0 +1,92 @@
+# price_series.py (가격 이력의 압축 표현: 아이템당 int32 배열 다섯 개)
+
+from datetime import date
+
+try:
+    import numpy as np
+except ImportError:
+    print("오류: numpy 라이브러리를 찾을 수 없습니다. 'pip install numpy'를 실행해주세요.")
+    exit()
+
+# --- 상수 정의 ---
+MISSING = -1 # 값이 없는 칸 (가격과 거래 수량은 음수가 될 수 없습니다)
+HISTORY_TYPENAME = 'MarketableItemDailyPriceHistory'
+
+
+def _column(values):
+    return np.array([MISSING if v is None else v for v in values], dtype=np.int32)
+
+
+class PriceSeries:
+    """한 아이템의 일별 가격 이력 (최신 날짜부터).
+
+    하루치 이력마다 dict와 날짜 문자열을 만드는 대신, 날짜 서수(date.toordinal)와
+    최저가/평균가/최고가/거래 수량을 각각 int32 배열 하나에 담습니다. 값이 없으면 MISSING입니다.
+    """
+
+    __slots__ = ("days", "lowest", "average", "highest", "counts")
+
+    def __init__(self, days, lowest, average, highest, counts):
+        self.days = days
+        self.lowest = lowest
+        self.average = average
+        self.highest = highest
+        self.counts = counts
+
+    def __len__(self):
+        return len(self.days)
+
+    @classmethod
+    def from_rows(cls, rows):
+        """(날짜 문자열, 최저가, 평균가, 최고가, 거래 수량) 행들로 만듭니다. price_store의 SQL 결과를 그대로 받습니다."""
+        rows = list(rows)
+        if not rows:
+            return cls.empty()
+        dates, lowest, average, highest, counts = zip(*rows)
+        days = np.array([date.fromisoformat(d[:10]).toordinal() for d in dates], dtype=np.int32)
+        return cls(days, _column(lowest), _column(average), _column(highest), _column(counts))
+
+    @classmethod
+    def from_history(cls, price_history):
+        """API/results.json 형식의 priceHistory 목록으로 만듭니다. 날짜가 없는 항목은 건너뜁니다."""
+        return cls.from_rows(
+            (h["date"], h.get("lowestPrice"), h.get("averagePrice"), h.get("highestPrice"), h.get("itemsCount"))
+            for h in price_history or () if h and h.get("date")
+        )
+
+    @classmethod
+    def empty(cls):
+        return cls(*(np.empty(0, dtype=np.int32) for _ in range(5)))
+
+    def window(self, days):
+        """최신 날짜를 포함해 최근 days일 안의 이력만 남긴 PriceSeries를 돌려줍니다."""
+        if not len(self):
+            return self
+        keep = self.days > self.days[0] - days
+        return PriceSeries(self.days[keep], self.lowest[keep], self.average[keep], self.highest[keep], self.counts[keep])
+
+    def to_history(self, with_typename=False):
+        """API/results.json 형식의 priceHistory 목록으로 되돌립니다."""
+        history = []
+        for day, lowest, average, highest, count in zip(self.days.tolist(), self.lowest.tolist(), self.average.tolist(),
+                                                         self.highest.tolist(), self.counts.tolist()):
+            entry = {
+                "date": date.fromordinal(day).isoformat(),
+                "lowestPrice": None if lowest == MISSING else lowest,
+                "averagePrice": None if average == MISSING else average,
+                "highestPrice": None if highest == MISSING else highest,
+                "itemsCount": None if count == MISSING else count
+            }
+            if with_typename:
+                entry["__typename"] = HISTORY_TYPENAME
+            history.append(entry)
+        return history
+
+
+def to_float(values):
+    """int32 배열을 계산용 float64로 바꾸며, 값이 없는 칸은 NaN으로 둡니다."""
+    return np.where(values == MISSING, np.nan, values.astype(np.float64))
+
+def as_series(history):
+    """PriceSeries는 그대로, priceHistory 목록은 PriceSeries로 바꿉니다."""
+    return history if isinstance(history, PriceSeries) else PriceSeries.from_history(history)
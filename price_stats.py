@@ -0,0 +1,84 @@
+# price_stats.py (전체 후보의 기간별 가격 통계를 배열 연산으로 한 번에 계산)
+
+from datetime import datetime, timezone
+
+try:
+    import numpy as np
+except ImportError:
+    print("오류: numpy 라이브러리를 찾을 수 없습니다. 'pip install numpy'를 실행해주세요.")
+    exit()
+
+from price_series import as_series, to_float
+
+# --- 상수 정의 ---
+WINDOWS = (7, 14) # 평균을 낼 기간 (일)
+
+
+def _flatten(histories):
+    """아이템별 이력을 (아이템 번호, 날짜 서수, 평균가, 최고가) 1차원 배열 네 개로 이어 붙입니다.
+
+    PriceSeries의 배열을 그대로 이어 붙이며, 값이 없는 칸은 NaN으로 둡니다.
+    """
+    series = [as_series(h) for h in histories]
+    if not series:
+        return (np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64),
+                np.empty(0, dtype=np.float64), np.empty(0, dtype=np.float64))
+    lengths = np.fromiter((len(s) for s in series), dtype=np.int64, count=len(series))
+    item_idx = np.repeat(np.arange(len(series), dtype=np.int64), lengths)
+    ordinals = np.concatenate([s.days for s in series]).astype(np.int64)
+    averages = to_float(np.concatenate([s.average for s in series]))
+    highs = to_float(np.concatenate([s.highest for s in series]))
+    return item_idx, ordinals, averages, highs
+
+
+def _masked_mean(item_idx, values, mask, n_items):
+    mask = mask & ~np.isnan(values)
+    sums = np.bincount(item_idx[mask], weights=values[mask], minlength=n_items)
+    counts = np.bincount(item_idx[mask], minlength=n_items)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(counts > 0, sums / np.maximum(counts, 1), np.nan)
+
+
+def compute_window_stats(histories, today=None, windows=WINDOWS):
+    """여러 아이템의 가격 이력으로 기간별 평균가와 '일일 최고가'의 평균을 한 번에 계산합니다.
+
+    histories는 아이템별 PriceSeries(또는 priceHistory 목록)의 리스트이며, 반환값은
+    {"avg_7d": 배열, "avg_high_7d": 배열, ...} 형태입니다. 기간 안에 값이 없으면 NaN입니다.
+    기존 계산과 같이 오늘과의 날짜 차이가 기간보다 작은 날만 포함합니다.
+    """
+    today = today or datetime.now(timezone.utc).date()
+    n_items = len(histories)
+    item_idx, ordinals, averages, highs = _flatten(histories)
+    days_ago = today.toordinal() - ordinals
+
+    stats = {}
+    for days in windows:
+        in_window = days_ago < days
+        stats[f"avg_{days}d"] = _masked_mean(item_idx, averages, in_window, n_items)
+        stats[f"avg_high_{days}d"] = _masked_mean(item_idx, highs, in_window, n_items)
+    return stats
+
+
+def with_fallback(values, fallback):
+    """NaN인 칸(기간 내 데이터 없음)을 fallback 값으로 채웁니다. fallback이 None인 칸은 NaN으로 남습니다."""
+    fallback = np.asarray(fallback, dtype=np.float64)
+    return np.where(np.isnan(values), fallback, values)
+
+def to_optional(values):
+    """배열을 파이썬 목록으로 바꾸며, NaN인 칸은 None으로 둡니다 (보고서용)."""
+    return np.where(np.isnan(values), None, values).tolist()
+
+
+def undervalue_and_spread(avg_price, current_sell, current_buy, transaction_fee, spread_profit_ratio):
+    """평균가 대비 저평가율(%)과 스프레드 수익성 여부를 전체 아이템에 대해 계산합니다.
+
+    저평가율은 반올림하지 않은 값이므로, 보고서에 넣을 때 round(..., 2)를 적용합니다.
+    """
+    avg_price = np.asarray(avg_price, dtype=np.float64)
+    current_sell = np.asarray(current_sell, dtype=np.float64)
+    current_buy = np.asarray(current_buy, dtype=np.float64)
+    positive = avg_price > 0
+    with np.errstate(invalid="ignore", divide="ignore"):
+        undervalue_ratio = np.where(positive, ((avg_price - current_sell) / avg_price) * 100, 0.0)
+    is_spread_profitable = positive & ((current_buy * (1 - transaction_fee) - current_sell) > (avg_price * spread_profit_ratio))
+    return undervalue_ratio, is_spread_profitable
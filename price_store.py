@@ -0,0 +1,197 @@
+# price_store.py (가격 이력 로컬 저장소: SQLite)
+
+import sqlite3
+from datetime import datetime, timedelta, timezone
+
+from graphql_client import build_operation
+from price_series import PriceSeries
+
+# --- 상수 정의 ---
+PRICE_DB_FILE = 'price_history.db'
+SQL_VARIABLE_LIMIT = 500 # IN (...) 조회 한 번에 넣을 아이템 수
+# 변동 감지 갱신: 목록 시세가 마지막으로 이력을 받았을 때와 같으면 이력 요청을 미룹니다.
+SNAPSHOT_COUNT_TOLERANCE = 0.10 # 판매/구매 주문 수가 이 비율 이상 바뀌어야 변동으로 봅니다
+DELTA_MAX_GAP_DAYS = 3          # 변동이 없어도 저장된 최신 날짜가 이보다 오래되면 다시 받습니다
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS price_history (
+    item_id TEXT NOT NULL,
+    date TEXT NOT NULL,
+    lowest_price INTEGER,
+    average_price INTEGER,
+    highest_price INTEGER,
+    items_count INTEGER,
+    PRIMARY KEY (item_id, date)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS history_fetches (
+    item_id TEXT PRIMARY KEY,
+    fetched_on TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS listing_snapshots (
+    item_id TEXT PRIMARY KEY,
+    lowest_price INTEGER,
+    highest_price INTEGER,
+    sell_count INTEGER,
+    buy_count INTEGER
+) WITHOUT ROWID;
+"""
+
+# --- 도우미 함수 ---
+def extract_price_history(response_data):
+    """GetItemPriceHistory 응답에서 일별 가격 이력 목록을 꺼냅니다."""
+    marketable_item = (response_data.get("data") or {}).get("game", {}).get("marketableItem") or {}
+    return marketable_item.get("priceHistory") or []
+
+def is_history_response(response_data):
+    """아이템 정보가 담긴 정상 응답인지 확인합니다 (실패한 작업은 None)."""
+    return bool(response_data and ((response_data.get("data") or {}).get("game") or {}).get("marketableItem"))
+
+def market_snapshot(market_data):
+    """목록/상세 응답의 marketData를 (최저 판매가, 최고 구매가, 판매 주문 수, 구매 주문 수)로 줄입니다. 시세가 없으면 None입니다."""
+    sell_stats, buy_stats = (market_data or {}).get("sellStats"), (market_data or {}).get("buyStats")
+    if not sell_stats or not buy_stats:
+        return None
+    return (sell_stats[0].get("lowestPrice"), buy_stats[0].get("highestPrice"), sell_stats[0].get("activeCount"), buy_stats[0].get("activeCount"))
+
+def _snapshot_moved(stored, current):
+    if stored[:2] != current[:2]:
+        return True
+    for before, after in zip(stored[2:], current[2:]):
+        if before is None or after is None:
+            if before != after:
+                return True
+        elif abs(after - before) > max(before, 1) * SNAPSHOT_COUNT_TOLERANCE:
+            return True
+    return False
+
+
+class PriceHistoryStore:
+    """(itemId, date)마다 하루치 가격 이력을 한 줄씩 저장하는 SQLite 저장소."""
+
+    def __init__(self, db_file=PRICE_DB_FILE):
+        self.conn = sqlite3.connect(db_file)
+        self.conn.executescript(_SCHEMA)
+
+    def close(self):
+        self.conn.close()
+
+    def upsert(self, item_id, price_history, fetched_on=None, snapshot=None):
+        """API 형식의 일별 이력을 저장합니다. 같은 날짜의 기존 값은 새 값으로 덮어씁니다.
+
+        snapshot(market_snapshot의 결과)을 넘기면 이력을 받은 시점의 목록 시세로 함께 기록합니다.
+        """
+        rows = [
+            (item_id, h["date"], h.get("lowestPrice"), h.get("averagePrice"), h.get("highestPrice"), h.get("itemsCount"))
+            for h in price_history if h and h.get("date")
+        ]
+        fetched_on = fetched_on or datetime.now(timezone.utc).date().isoformat()
+        with self.conn:
+            self.conn.executemany(
+                "INSERT INTO price_history VALUES (?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT(item_id, date) DO UPDATE SET lowest_price=excluded.lowest_price, "
+                "average_price=excluded.average_price, highest_price=excluded.highest_price, items_count=excluded.items_count",
+                rows
+            )
+            self.conn.execute(
+                "INSERT INTO history_fetches VALUES (?, ?) ON CONFLICT(item_id) DO UPDATE SET fetched_on=excluded.fetched_on",
+                (item_id, fetched_on)
+            )
+            if snapshot is not None:
+                self.conn.execute("INSERT OR REPLACE INTO listing_snapshots VALUES (?, ?, ?, ?, ?)", (item_id, *snapshot))
+
+    def get_series(self, item_id):
+        """저장된 이력을 PriceSeries(최신 날짜부터)로 돌려줍니다. API 형식의 목록이 필요하면 to_history()로 바꿉니다."""
+        return PriceSeries.from_rows(self.conn.execute(
+            "SELECT date, lowest_price, average_price, highest_price, items_count FROM price_history "
+            "WHERE item_id = ? ORDER BY date DESC",
+            (item_id,)
+        ))
+
+    def get_series_many(self, item_ids):
+        """여러 아이템의 이력을 {itemId: PriceSeries}로 한꺼번에 읽습니다. 이력이 없는 아이템은 빈 PriceSeries입니다."""
+        item_ids = list(dict.fromkeys(item_ids))
+        rows_by_item = {item_id: [] for item_id in item_ids}
+        for start in range(0, len(item_ids), SQL_VARIABLE_LIMIT):
+            chunk = item_ids[start:start + SQL_VARIABLE_LIMIT]
+            for item_id, *row in self.conn.execute(
+                "SELECT item_id, date, lowest_price, average_price, highest_price, items_count FROM price_history "
+                f"WHERE item_id IN ({', '.join('?' * len(chunk))}) ORDER BY item_id, date DESC",
+                chunk
+            ):
+                rows_by_item[item_id].append(row)
+        return {item_id: PriceSeries.from_rows(rows) for item_id, rows in rows_by_item.items()}
+
+    def stale_item_ids(self, item_ids, today=None):
+        """가격 이력을 새로 받아야 하는 아이템 ID를 입력 순서대로 돌려줍니다.
+
+        서버의 일별 이력은 어제 날짜까지 채워지므로, 저장된 최신 날짜가 어제 이전이고
+        오늘 아직 한 번도 받지 않은 아이템만 오래된 것으로 봅니다.
+        """
+        today = today or datetime.now(timezone.utc).date()
+        yesterday = (today - timedelta(days=1)).isoformat()
+        item_ids = list(item_ids)
+        unique_ids = list(dict.fromkeys(item_ids))
+        fresh = set()
+        for start in range(0, len(unique_ids), SQL_VARIABLE_LIMIT):
+            chunk = unique_ids[start:start + SQL_VARIABLE_LIMIT]
+            for item_id, newest_date, fetched_on in self.conn.execute(
+                "SELECT f.item_id, (SELECT MAX(date) FROM price_history h WHERE h.item_id = f.item_id), f.fetched_on "
+                f"FROM history_fetches f WHERE f.item_id IN ({', '.join('?' * len(chunk))})",
+                chunk
+            ):
+                if (newest_date and newest_date >= yesterday) or fetched_on == today.isoformat():
+                    fresh.add(item_id)
+        return [item_id for item_id in item_ids if item_id not in fresh]
+
+    def quiet_item_ids(self, item_ids, snapshots, today=None):
+        """목록 시세가 마지막으로 이력을 받았을 때와 같고, 저장된 최신 날짜가 DELTA_MAX_GAP_DAYS일 안인 아이템 ID 집합을 돌려줍니다.
+
+        이런 아이템은 그사이 거래가 거의 없었으므로 이력을 다시 받지 않고 저장된 이력을 씁니다.
+        """
+        today = today or datetime.now(timezone.utc).date()
+        oldest_allowed = (today - timedelta(days=DELTA_MAX_GAP_DAYS)).isoformat()
+        item_ids = [item_id for item_id in dict.fromkeys(item_ids) if snapshots.get(item_id) is not None]
+        quiet = set()
+        for start in range(0, len(item_ids), SQL_VARIABLE_LIMIT):
+            chunk = item_ids[start:start + SQL_VARIABLE_LIMIT]
+            for item_id, lowest, highest, sell_count, buy_count, newest_date in self.conn.execute(
+                "SELECT s.item_id, s.lowest_price, s.highest_price, s.sell_count, s.buy_count, "
+                "(SELECT MAX(date) FROM price_history h WHERE h.item_id = s.item_id) FROM listing_snapshots s "
+                f"WHERE s.item_id IN ({', '.join('?' * len(chunk))})",
+                chunk
+            ):
+                if newest_date and newest_date >= oldest_allowed and not _snapshot_moved((lowest, highest, sell_count, buy_count), snapshots[item_id]):
+                    quiet.add(item_id)
+        return quiet
+
+
+def refresh_price_histories(client, store, history_template, item_ids, snapshots=None):
+    """오래된 아이템의 가격 이력만 요청해 저장소를 갱신하고, 이력을 쓸 수 있는 아이템 ID 집합을 돌려줍니다.
+
+    snapshots({itemId: market_snapshot})를 넘기면 변동 감지 갱신을 합니다. 오래되었더라도 목록 시세가
+    마지막으로 이력을 받았을 때와 같은 아이템은 요청하지 않고, 받은 이력에는 그때의 시세를 함께 기록합니다.
+    """
+    snapshots = snapshots or {}
+    stale_ids = store.stale_item_ids(item_ids)
+    quiet_ids = store.quiet_item_ids(stale_ids, snapshots) if snapshots else set()
+    stale_ids = [item_id for item_id in stale_ids if item_id not in quiet_ids]
+    available = set(item_ids) - set(stale_ids)
+    quiet_note = f", 그중 {len(quiet_ids)}개는 시세 변동 없음" if snapshots else ""
+    print(f"  - 가격 이력: {len(item_ids)}개 중 {len(stale_ids)}개만 새로 요청합니다. (나머지 {len(available)}개는 로컬 저장소 사용{quiet_note})")
+    if not stale_ids:
+        return available
+
+    payloads = [build_operation(history_template, itemId=item_id) for item_id in stale_ids]
+
+    # 묶음이 도착할 때마다 바로 저장하므로, 중간에 중단되어도 받은 이력은 남습니다.
+    def save_histories(succeeded):
+        for index, res in succeeded.items():
+            if is_history_response(res):
+                store.upsert(stale_ids[index], extract_price_history(res), snapshot=snapshots.get(stale_ids[index]))
+                available.add(stale_ids[index])
+
+    client.execute_batched(payloads, on_success=save_histories)
+    for item_id in stale_ids:
+        if item_id not in available:
+            print(f"    - 가격 이력 조회 실패 (ID: {item_id})")
+    return available
@@ -2,18 +2,30 @@
 
 import json
 import os
-import time
 from datetime import datetime, timezone
-from curl_cffi import requests
+from graphql_client import GraphQLClient, build_headers, build_operation, operation_path
+from market_cache import MarketCache
+from metrics import METRICS
+from ndjson_store import is_ndjson_path, write_records
+from price_store import PriceHistoryStore, extract_price_history
+from trade_sync import sync_trades
 
 # --- 상수 정의 ---
 CONFIG_FILE = 'config.json'
+# 확장자를 .ndjson으로 바꾸면 줄 단위(NDJSON) 저장소를 사용합니다 (변환: python ndjson_store.py results.json transactions.json)
 TRANSACTIONS_FILE = 'transactions.json'
 RESULTS_FILE = 'results.json'
 GRAPHQL_DIR = 'graphql'
-API_URL = "https://public-ubiservices.ubi.com/v1/profiles/me/uplay/graphql"
 APP_ID = "3587dc57-db54-4429-b69a-18b546397706"
 
+# --- 동시 요청 설정 ---
+MAX_CONCURRENT_REQUESTS = 4 # 동시에 진행할 일괄 요청 수
+REQUESTS_PER_SECOND = 2.0   # 모든 작업자가 공유하는 초당 요청 한도
+INITIAL_BATCH_SIZE = 10     # 한 번의 일괄 요청에 담을 초기 작업 수 (아이템당 상세+이력 2개 작업, 이후 자동 조절)
+STREAM_CHUNK_ITEMS = 50     # 한 번에 요청하고 저장하는 아이템 수
+FULL_SYNC = False           # True이면 거래 내역을 증분 동기화하지 않고 처음부터 모두 다시 받습니다
+API_HISTORY_DAYS = 30       # GetItemPriceHistory가 돌려주는 기간 (일). results.json의 priceHistory도 이 기간만 기록합니다
+
 # --- 도우미 함수 ---
 def load_json_file(file_path):
     """JSON 파일을 안전하게 로드합니다."""
@@ -33,65 +45,44 @@ def save_json_file(data, file_path):
         json.dump(data, f, ensure_ascii=False, indent=2)
     print(f"성공: 데이터가 '{file_path}' 파일에 저장되었습니다.")
 
-def make_api_call(session, headers, payload):
-    """GraphQL API를 호출하고 응답을 반환합니다."""
-    response = session.post(API_URL, headers=headers, json=[payload], timeout=30, impersonate="chrome110")
-    
-    if response.status_code == 401:
-        raise Exception("인증 실패(401). 'config.json'의 토큰/세션 ID가 만료되었습니다.")
-    response.raise_for_status()
-    
-    data = response.json()
-    # 일부 단일 요청은 리스트가 아닐 수 있으므로 확인 후 처리
-    if isinstance(data, list):
-        data = data[0]
-        
-    if data.get("errors"):
-        raise Exception(f"GraphQL API 오류: {data['errors']}")
-    return data
-
 # --- 메인 로직 ---
-def fetch_all_transactions(session, headers, graphql_query):
-    """모든 거래 내역을 페이지네이션을 통해 가져옵니다."""
-    all_transactions = []
-    offset = 0
-    limit = 100
-    
-    print("\n[1단계] 전체 거래 내역 수집을 시작합니다...")
-    while True:
-        print(f"  - {offset}번째부터 {limit}개 거래 내역을 요청합니다...")
-        graphql_query["variables"]["offset"] = offset
-        
-        response_data = make_api_call(session, headers, graphql_query)
-        transactions_data = response_data.get("data", {}).get("game", {}).get("viewer", {}).get("meta", {}).get("trades", {})
-        transactions = transactions_data.get("nodes", [])
-        
-        if not transactions:
-            print("  - 더 이상 가져올 거래 내역이 없습니다.")
-            break
-            
-        all_transactions.extend(transactions)
-        
-        total_count = transactions_data.get("totalCount", 0)
-        if len(all_transactions) >= total_count:
-            print("  - 모든 거래 내역을 수집했습니다.")
-            break
-
-        offset += len(transactions)
-        time.sleep(1)
-        
-    print(f"총 {len(all_transactions)}개의 거래 내역을 수집했습니다.")
+def fetch_all_transactions(client, graphql_query):
+    """새 거래 내역만 받아 로컬 거래 내역(transactions.json)에 병합하고 전체 목록을 돌려줍니다."""
+    print("\n[1단계] 거래 내역 동기화를 시작합니다...")
+    all_transactions, _ = sync_trades(client, graphql_query, TRANSACTIONS_FILE, full=FULL_SYNC)
+    print(f"총 {len(all_transactions)}개의 거래 내역을 확보했습니다.")
     return all_transactions
 
-def process_item_details(session, headers, transactions):
-    """거래 내역을 기반으로 각 아이템의 상세 정보와 가격을 가져옵니다."""
+def _build_result_item(item_info, details_data, price_history):
+    market_item_details = details_data.get("data", {}).get("game", {}).get("marketableItem", {}) or {}
+    market_data = market_item_details.get("marketData", {}) or {}
+
+    return {
+        "itemId": item_info.get("itemId"),
+        "name": item_info.get("name"),
+        "type": item_info.get("type"),
+        "tags": item_info.get("tags", []),
+        "assetUrl": item_info.get("assetUrl"),
+        "lowestSellOrder": market_data.get("sellStats", [{}])[0].get("lowestPrice") if market_data.get("sellStats") else None,
+        "highestBuyOrder": market_data.get("buyStats", [{}])[0].get("highestPrice") if market_data.get("buyStats") else None,
+        "lastSoldPrice": market_data.get("lastSoldAt", [{}])[0].get("price") if market_data.get("lastSoldAt") else None,
+        "priceHistory": price_history,
+        "lastUpdated": datetime.now(timezone.utc).isoformat()
+    }
+
+def iter_item_details(client, store, transactions):
+    """거래 내역을 기반으로 각 아이템의 상세 정보와 가격을 가져와 레코드를 하나씩 돌려줍니다.
+
+    아이템마다 상세 정보와 가격 이력 작업을 만들어 일괄 요청으로 묶고,
+    최대 MAX_CONCURRENT_REQUESTS개의 요청을 동시에 진행합니다. 아이템을
+    STREAM_CHUNK_ITEMS개씩 나눠 처리하므로, 받은 묶음의 레코드는 바로 저장할 수 있습니다.
+    """
     print("\n[2단계] 아이템별 상세 정보 수집을 시작합니다...")
     
     details_query_template = load_json_file(os.path.join(GRAPHQL_DIR, 'GetItemDetails.json'))
-    history_query_template = load_json_file(os.path.join(GRAPHQL_DIR, 'GetItemPriceHistory.json'))
-    if not details_query_template or not history_query_template: return []
+    history_query_template = load_json_file(operation_path(GRAPHQL_DIR, 'GetItemPriceHistory.json'))
+    if not details_query_template or not history_query_template: return
 
-    final_results = []
     processed_item_ids = set()
 
     unique_items = []
@@ -104,81 +95,87 @@ def process_item_details(session, headers, transactions):
 
     print(f"분석할 고유 아이템 개수: {len(unique_items)}개")
 
-    for item_info in unique_items:
-        item_id = item_info.get("itemId")
-        try:
-            print(f"  - 아이템 '{item_info.get('name')}'의 정보를 요청합니다...")
-            
-            details_query_template["variables"]["itemId"] = item_id
-            history_query_template["variables"]["itemId"] = item_id
-            
-            batch_payload = [details_query_template, history_query_template]
-            
-            response = session.post(API_URL, headers=headers, json=batch_payload, timeout=30, impersonate="chrome110")
-            response.raise_for_status()
-            batch_response_data = response.json()
-            
-            details_data = batch_response_data[0]
-            history_data = batch_response_data[1]
-
-            market_item_details = details_data.get("data", {}).get("game", {}).get("marketableItem", {}) or {}
-            market_data = market_item_details.get("marketData", {}) or {}
-            
-            market_item_history = history_data.get("data", {}).get("game", {}).get("marketableItem", {}) or {}
-            price_history = market_item_history.get("priceHistory", [])
-
-            result_item = {
-                "itemId": item_id,
-                "name": item_info.get("name"),
-                "type": item_info.get("type"),
-                "tags": item_info.get("tags", []),
-                "assetUrl": item_info.get("assetUrl"),
-                "lowestSellOrder": market_data.get("sellStats", [{}])[0].get("lowestPrice") if market_data.get("sellStats") else None,
-                "highestBuyOrder": market_data.get("buyStats", [{}])[0].get("highestPrice") if market_data.get("buyStats") else None,
-                "lastSoldPrice": market_data.get("lastSoldAt", [{}])[0].get("price") if market_data.get("lastSoldAt") else None,
-                "priceHistory": price_history,
-                "lastUpdated": datetime.now(timezone.utc).isoformat()
-            }
-            final_results.append(result_item)
-            time.sleep(1)
-
-        except Exception as e:
+    # 가격 이력은 로컬 저장소에서 오래된 아이템만 다시 요청합니다.
+    stale_ids = set(store.stale_item_ids([item_info.get("itemId") for item_info in unique_items]))
+    print(f"가격 이력을 새로 받을 아이템: {len(stale_ids)}개 (나머지는 로컬 저장소 사용)")
+
+    result_count = 0
+    for start in range(0, len(unique_items), STREAM_CHUNK_ITEMS):
+        chunk_items = unique_items[start:start + STREAM_CHUNK_ITEMS]
+
+        operations = []
+        details_index, history_index = {}, {}
+        for item_info in chunk_items:
+            item_id = item_info.get("itemId")
+            details_index[item_id] = len(operations)
+            operations.append(build_operation(details_query_template, itemId=item_id))
+            if item_id in stale_ids:
+                history_index[item_id] = len(operations)
+                operations.append(build_operation(history_query_template, itemId=item_id))
+
+        # 응답은 요청 순서대로 돌아오므로 results.json의 순서가 유지됩니다.
+        responses = client.execute_batched(operations, max_workers=MAX_CONCURRENT_REQUESTS)
+
+        for item_info in chunk_items:
+            item_id = item_info.get("itemId")
             item_name = item_info.get("name", "Unknown")
-            print(f"  - 처리 실패: '{item_name}' 처리 중 오류 발생. 오류: {e}")
+            details_data = responses[details_index[item_id]]
+            history_data = responses[history_index[item_id]] if item_id in history_index else None
+            if details_data is None or (item_id in history_index and history_data is None):
+                print(f"  - 처리 실패: '{item_name}'의 정보를 가져오지 못했습니다.")
+                continue
+            try:
+                if history_data is not None:
+                    store.upsert(item_id, extract_price_history(history_data))
+                # 저장소에는 지난 실행에서 받은 이력도 쌓이므로, API가 돌려주는 기간만큼만 API와 같은 형식으로 기록합니다.
+                price_history = store.get_series(item_id).window(API_HISTORY_DAYS).to_history(with_typename=True)
+                result_item = _build_result_item(item_info, details_data, price_history)
+            except Exception as e:
+                print(f"  - 처리 실패: '{item_name}' 처리 중 오류 발생. 오류: {e}")
+                continue
+            result_count += 1
+            yield result_item
             
-    print(f"총 {len(final_results)}개 아이템의 상세 정보를 수집했습니다.")
-    return final_results
+    print(f"총 {result_count}개 아이템의 상세 정보를 수집했습니다.")
+
+def process_item_details(client, store, transactions):
+    """iter_item_details의 결과를 목록으로 모아 돌려줍니다."""
+    return list(iter_item_details(client, store, transactions))
 
 def main():
     """메인 실행 함수"""
     config = load_json_file(CONFIG_FILE)
     if not config: return
 
-    # --- 여기가 핵심 수정 사항입니다 ---
-    # 당신이 찾아낸 ubi-localecode 헤더를 추가하여 모든 응답을 한글로 받습니다.
-    headers = {
-        "Authorization": config.get('uplay_token'),
-        "Ubi-AppId": APP_ID,
-        "Ubi-SessionId": config.get('ubi_session_id'),
-        "Content-Type": "application/json",
-        "Ubi-LocaleCode": "ko-KR" 
-    }
-    # ------------------------------------
-
-    session = requests.Session()
+    cache = MarketCache()
+    client = GraphQLClient(build_headers(config, APP_ID), requests_per_second=REQUESTS_PER_SECOND, batch_size=INITIAL_BATCH_SIZE, cache=cache)
     
     try:
         transactions_query = load_json_file(os.path.join(GRAPHQL_DIR, 'GetTransactions.json'))
         if not transactions_query: return
         
-        transactions = fetch_all_transactions(session, headers, transactions_query)
-        save_json_file(transactions, TRANSACTIONS_FILE)
+        with METRICS.span("stage1_transactions"):
+            transactions = fetch_all_transactions(client, transactions_query)
 
-        results = process_item_details(session, headers, transactions)
-        save_json_file(results, RESULTS_FILE)
+        store = PriceHistoryStore()
+        try:
+            with METRICS.span("stage2_item_details"):
+                if is_ndjson_path(RESULTS_FILE):
+                    # 받은 레코드를 바로 한 줄씩 기록하므로 전체 결과를 메모리에 모으지 않습니다.
+                    write_records(RESULTS_FILE, iter_item_details(client, store, transactions))
+                    print(f"성공: 데이터가 '{RESULTS_FILE}' 파일에 저장되었습니다.")
+                else:
+                    results = process_item_details(client, store, transactions)
+                    save_json_file(results, RESULTS_FILE)
+        finally:
+            store.close()
         
     except Exception as e:
         print(f"\n치명적인 오류 발생: {e}")
+    finally:
+        cache.report()
+        cache.close()
+        METRICS.write("scraper")
 
     print("\n모든 작업이 완료되었습니다.")
 
@@ -0,0 +1,96 @@
+# shared_rate_limiter.py (동시에 실행되는 스크립트들이 함께 쓰는 요청 한도: SQLite 토큰 버킷)
+
+import sqlite3
+import threading
+import time
+
+from metrics import METRICS
+
+# --- 상수 정의 ---
+RATE_LIMIT_DB_FILE = 'rate_limit.db'
+SHARED_REQUESTS_PER_SECOND = 2.0 # 모든 스크립트를 합친 초당 요청 한도 (서버 한도보다 조금 낮게)
+SHARED_BURST = 2                 # 쉬고 있던 뒤에 한꺼번에 보낼 수 있는 요청 수
+DEFAULT_BUCKET = 'graphql'
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS buckets (
+    name TEXT PRIMARY KEY,
+    tokens REAL NOT NULL,
+    updated_at REAL NOT NULL,
+    paused_until REAL NOT NULL DEFAULT 0
+) WITHOUT ROWID;
+"""
+
+
+class SharedRateLimiter:
+    """여러 프로세스가 같은 SQLite 파일의 토큰 버킷에서 요청 권한을 받아 가는 속도 제한기.
+
+    토큰은 초당 requests_per_second개씩 burst개까지 차오르며, 요청 하나에 하나씩 씁니다.
+    한 프로세스가 RATE_LIMIT 대기를 요청받으면 pause()로 기록해 다른 프로세스도 함께 기다립니다.
+    """
+
+    def __init__(self, db_file=RATE_LIMIT_DB_FILE, requests_per_second=SHARED_REQUESTS_PER_SECOND, burst=SHARED_BURST, name=DEFAULT_BUCKET):
+        self.rate = requests_per_second
+        self.burst = burst
+        self.name = name
+        # 트랜잭션은 BEGIN IMMEDIATE로 직접 열어, 토큰을 읽고 쓰는 동안 다른 프로세스가 끼어들지 못하게 합니다.
+        self.conn = sqlite3.connect(db_file, timeout=30, isolation_level=None, check_same_thread=False)
+        self.conn.executescript(_SCHEMA)
+        self._lock = threading.Lock()
+
+    def close(self):
+        self.conn.close()
+
+    def _take(self):
+        """버킷을 현재 시각까지 채우고 토큰이 있으면 하나를 씁니다. 토큰이 없으면 기다려야 할 시간(초)을 돌려줍니다."""
+        with self._lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                now = time.time()
+                row = self.conn.execute("SELECT tokens, updated_at, paused_until FROM buckets WHERE name = ?", (self.name,)).fetchone()
+                tokens, updated_at, paused_until = row if row else (self.burst, now, 0.0)
+                tokens = min(self.burst, tokens + max(0.0, now - updated_at) * self.rate)
+                updated_at = max(now, updated_at)
+                if now < paused_until:
+                    wait = paused_until - now
+                elif tokens >= 1:
+                    tokens -= 1
+                    wait = 0.0
+                else:
+                    wait = (1 - tokens) / self.rate
+                self.conn.execute(
+                    "INSERT INTO buckets VALUES (?, ?, ?, ?) "
+                    "ON CONFLICT(name) DO UPDATE SET tokens=excluded.tokens, updated_at=excluded.updated_at, paused_until=excluded.paused_until",
+                    (self.name, tokens, updated_at, paused_until)
+                )
+                self.conn.execute("COMMIT")
+            except Exception:
+                self.conn.execute("ROLLBACK")
+                raise
+        return wait
+
+    def acquire(self):
+        """토큰을 얻을 때까지 기다립니다."""
+        while True:
+            wait = self._take()
+            if wait <= 0:
+                return
+            METRICS.record_sleep(wait)
+            time.sleep(wait)
+
+    def pause(self, seconds):
+        """모든 프로세스의 다음 요청을 seconds초 뒤로 미루고, 대기가 끝난 뒤 한꺼번에 몰리지 않도록 버킷을 비웁니다."""
+        with self._lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                until = time.time() + seconds
+                self.conn.execute(
+                    "INSERT INTO buckets VALUES (?, 0, ?, ?) "
+                    "ON CONFLICT(name) DO UPDATE SET tokens=0, updated_at=MAX(updated_at, excluded.updated_at), "
+                    "paused_until=MAX(paused_until, excluded.paused_until)",
+                    (self.name, until, until)
+                )
+                self.conn.execute("COMMIT")
+            except Exception:
+                self.conn.execute("ROLLBACK")
+                raise
@@ -0,0 +1,177 @@
+# trade_sync.py (거래 내역 증분 동기화)
+
+import json
+import os
+import re
+import time
+
+from ndjson_store import append_records, is_ndjson_path, iter_records, write_records
+
+# --- 상수 정의 ---
+TRANSACTIONS_FILE = 'transactions.json'
+SYNC_STATE_FILE = 'sync_state.json'
+PAGE_LIMIT = 100
+FULL_SYNC_INTERVAL = 24 * 60 * 60 # 증분 동기화로는 알 수 없는 변경(취소된 주문 등)을 정리하기 위해 전체 동기화하는 간격 (초)
+OPEN_TRADE_STATE = "Created" # 아직 체결되지 않은 주문의 상태
+
+# --- 도우미 함수 ---
+def _load_json(file_path, default):
+    if not os.path.exists(file_path):
+        return default
+    try:
+        with open(file_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except json.JSONDecodeError:
+        print(f"경고: '{file_path}' 파일의 형식이 잘못되어 새로 만듭니다.")
+        return default
+
+def _save_json(data, file_path):
+    with open(file_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+
+def _extract_trades(response_data):
+    return response_data.get("data", {}).get("game", {}).get("viewer", {}).get("meta", {}).get("trades") or {}
+
+def _merge_trade(stored, trade):
+    """저장된 거래에 새 거래를 필드 단위로 합칩니다.
+
+    쿼리마다 받아오는 필드가 다르므로(GetTransactionsHistory의 tradeItems에는 tags/type이 없음),
+    사전은 재귀적으로 합치고 길이가 같은 목록은 같은 자리끼리 합쳐 기존 필드를 잃지 않게 합니다.
+    """
+    if isinstance(stored, dict) and isinstance(trade, dict):
+        merged = dict(stored)
+        for key, value in trade.items():
+            merged[key] = _merge_trade(stored[key], value) if key in stored else value
+        return merged
+    if isinstance(stored, list) and isinstance(trade, list) and len(stored) == len(trade):
+        return [_merge_trade(old, new) for old, new in zip(stored, trade)]
+    return trade
+
+def _queried_states(query):
+    """쿼리의 filterBy states 목록을 돌려줍니다. 찾지 못하면 빈 집합을 돌려줍니다."""
+    match = re.search(r'states:\s*\[([^\]]*)\]', query.get("query", ""))
+    return {state.strip() for state in match.group(1).split(",")} if match else set()
+
+def _read_store(store_file):
+    """저장소를 {거래 id: 거래} 사전과 파일의 레코드 수로 읽습니다.
+
+    NDJSON 저장소는 변경된 거래를 덧붙여 기록하므로, 같은 id가 여러 번 나오면 마지막 줄을 씁니다.
+    """
+    if is_ndjson_path(store_file):
+        store, record_count = {}, 0
+        if os.path.exists(store_file):
+            for trade in iter_records(store_file):
+                record_count += 1
+                if trade.get("id"):
+                    store[trade["id"]] = trade
+        return store, record_count
+    trades = _load_json(store_file, [])
+    return {trade["id"]: trade for trade in trades if trade.get("id")}, len(trades)
+
+def _sorted_trades(store):
+    return sorted(store.values(), key=lambda x: x.get("lastModifiedAt", ""), reverse=True)
+
+def load_trades(store_file=TRANSACTIONS_FILE):
+    """로컬 거래 내역 저장소를 최신 수정 순서의 목록으로 읽습니다."""
+    store, _ = _read_store(store_file)
+    return _sorted_trades(store)
+
+# --- 메인 로직 ---
+def sync_trades(client, query, store_file=TRANSACTIONS_FILE, state_file=SYNC_STATE_FILE, full=False):
+    """서버의 거래 내역을 로컬 저장소에 병합하고 (전체 거래 목록, 새로 받은 거래 목록)을 돌려줍니다.
+
+    GetTransactions* 쿼리는 LAST_MODIFIED_AT 기준 최신순으로 정렬되어 오므로,
+    지난 동기화 때 본 가장 최신 거래보다 오래된(변경 없는) 거래를 만나면 페이지 요청을 멈춥니다.
+    동기화 기준점은 쿼리(operationName)마다 따로 기록합니다. 쿼리마다 받아오는 거래 상태와
+    필드가 다르기 때문입니다. full=True이면 처음부터 모든 페이지를 다시 받습니다.
+
+    취소된 주문은 쿼리의 states 조건에서 빠져 다시 내려오지 않으므로 증분 동기화로는 알 수 없습니다.
+    그래서 FULL_SYNC_INTERVAL마다 전체 동기화를 하고, 그때 서버 목록에 없는 미체결(Created) 주문을 저장소에서 지웁니다.
+    """
+    operation_name = query.get("operationName")
+    sync_state = _load_json(state_file, {})
+    previous_state = sync_state.get(operation_name, {})
+    if not full and time.time() - previous_state.get("lastFullSyncAt", 0) > FULL_SYNC_INTERVAL:
+        full = True
+    watermark = {} if full else previous_state
+    newest_known_at = watermark.get("newestLastModifiedAt")
+
+    store, record_count = _read_store(store_file)
+    if not store:
+        newest_known_at = None
+
+    new_trades = []
+    seen_ids = set()
+    offset = 0
+    limit = query["variables"].get("limit", PAGE_LIMIT)
+    mode = "증분" if newest_known_at else "전체"
+    print(f"  - 거래 내역 {mode} 동기화를 시작합니다... (기준: {newest_known_at or '없음'})")
+
+    while True:
+        print(f"  - {offset}번째부터 {limit}개 거래 내역을 요청합니다...")
+        response_data = client.execute(dict(query, variables=dict(query["variables"], offset=offset, limit=limit)))
+        trades_data = _extract_trades(response_data)
+        nodes = trades_data.get("nodes") or []
+
+        reached_known = False
+        for node in nodes:
+            modified_at = node.get("lastModifiedAt") or ""
+            seen_ids.add(node.get("id"))
+            stored = store.get(node.get("id"))
+            unchanged = stored is not None and stored.get("lastModifiedAt") == modified_at
+            if newest_known_at and (modified_at < newest_known_at or (modified_at == newest_known_at and unchanged)):
+                reached_known = True
+                break
+            new_trades.append(node)
+
+        if reached_known:
+            print("  - 이미 저장된 거래 내역에 도달했습니다.")
+            break
+        if len(nodes) < limit:
+            print("  - 더 이상 가져올 거래 내역이 없습니다.")
+            break
+        total_count = trades_data.get("totalCount")
+        offset += len(nodes)
+        if total_count is not None and offset >= total_count:
+            print("  - 모든 거래 내역을 수집했습니다.")
+            break
+
+    # 같은 거래가 다른 쿼리로 저장되어 있으면, 기존 필드를 유지한 채 새 값으로 덮어씁니다.
+    merged_trades = []
+    for trade in new_trades:
+        trade_id = trade.get("id")
+        if trade_id:
+            store[trade_id] = _merge_trade(store.get(trade_id, {}), trade)
+            merged_trades.append(store[trade_id])
+
+    # 전체 동기화에서 서버가 돌려주지 않은 미체결 주문은 취소되었거나 만료된 것이므로 지웁니다.
+    removed_ids = []
+    if full and OPEN_TRADE_STATE in _queried_states(query):
+        removed_ids = [trade_id for trade_id, trade in store.items()
+                       if trade.get("state") == OPEN_TRADE_STATE and trade_id not in seen_ids]
+        for trade_id in removed_ids:
+            del store[trade_id]
+        if removed_ids:
+            print(f"  - 서버 목록에 없는 미체결 주문 {len(removed_ids)}건(취소/만료)을 저장소에서 지웁니다.")
+
+    all_trades = _sorted_trades(store)
+    if not is_ndjson_path(store_file):
+        _save_json(all_trades, store_file)
+    elif removed_ids or record_count + len(merged_trades) > 2 * len(store):
+        # 덧붙이기로는 지울 수 없으므로 지운 주문이 있거나, 덮어쓴 옛 기록이 절반을 넘으면 한 번 정리해서 다시 씁니다.
+        write_records(store_file, all_trades)
+    else:
+        append_records(store_file, merged_trades)
+
+    if new_trades or full:
+        operation_state = dict(previous_state)
+        if new_trades:
+            newest = new_trades[0]
+            operation_state.update(newestTradeId=newest.get("id"), newestLastModifiedAt=newest.get("lastModifiedAt"))
+        if full:
+            operation_state["lastFullSyncAt"] = time.time()
+        sync_state[operation_name] = operation_state
+        _save_json(sync_state, state_file)
+
+    print(f"  - 새로 받은 거래 {len(new_trades)}건을 병합했습니다. (저장된 거래 총 {len(all_trades)}건)")
+    return all_trades, new_trades